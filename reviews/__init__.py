@@ -1,8 +1,10 @@
 from importlib import import_module
+from inspect import signature
 
 from django.apps import apps as django_apps
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
@@ -18,13 +20,21 @@ DEFAULT_REVIEW_RATING_CHOICES = (
 
 default_app_config = 'reviews.apps.ReviewsAppConfig'
 
+# Review app package and its resolved functions and classes keyed by (review app name, name)
+_resolved = {}
+
 
 def get_review_app():
     """
     Get the review app (i.e. "reviews") as defined in the settings
     """
-    # Make sure the app's in INSTALLED_APPS
     review_app = get_review_app_name()
+    try:
+        return _resolved[(review_app, None)]
+    except KeyError:
+        pass
+
+    # Make sure the app's in INSTALLED_APPS
     if not django_apps.is_installed(review_app):
         raise ImproperlyConfigured(
             "The REVIEW_APP (%r) must be in INSTALLED_APPS" % review_app
@@ -38,6 +48,7 @@ def get_review_app():
             "The REVIEW_APP setting refers to a non-existing package. (%s)" % e
         )
 
+    _resolved[(review_app, None)] = package
     return package
 
 
@@ -49,43 +60,115 @@ def get_review_app_name():
     return getattr(settings, 'REVIEW_APP', DEFAULT_REVIEW_APP)
 
 
+def get_review_app_function(name):
+    """
+    Returns the function of custom review app or None if it is not defined.
+    """
+    review_app = get_review_app_name()
+    try:
+        return _resolved[(review_app, name)]
+    except KeyError:
+        pass
+    function = None
+    if review_app != DEFAULT_REVIEW_APP:
+        function = getattr(get_review_app(), name, None)
+    _resolved[(review_app, name)] = function
+    return function
+
+
 def get_review_model():
     """
     Returns the review model class.
     """
-    if get_review_app_name() != DEFAULT_REVIEW_APP and hasattr(get_review_app(), "get_review_model"):
-        return get_review_app().get_review_model()
+    review_app = get_review_app_name()
+    try:
+        return _resolved[(review_app, 'model')]
+    except KeyError:
+        pass
+    function = get_review_app_function("get_review_model")
+    if function is not None:
+        model = function()
     else:
         from reviews.models import Review
-        return Review
+        model = Review
+    _resolved[(review_app, 'model')] = model
+    return model
 
 
 def get_review_form():
     """
     Returns the review ModelForm class.
     """
-    if get_review_app_name() != DEFAULT_REVIEW_APP and hasattr(get_review_app(), "get_review_form"):
-        return get_review_app().get_review_form()
+    review_app = get_review_app_name()
+    try:
+        return _resolved[(review_app, 'form')]
+    except KeyError:
+        pass
+    function = get_review_app_function("get_review_form")
+    if function is not None:
+        form = function()
     else:
         from reviews.forms import ReviewForm
-        return ReviewForm
+        form = ReviewForm
+    _resolved[(review_app, 'form')] = form
+    return form
 
 
 def get_review_form_target():
     """
     Returns the target URL for the review form submission view.
     """
-    if get_review_app_name() != DEFAULT_REVIEW_APP and hasattr(get_review_app(), "get_review_form_target"):
-        return get_review_app().get_review_form_target()
+    function = get_review_app_function("get_review_form_target")
+    if function is not None:
+        return function()
     else:
         return reverse("post-review")
 
 
+def accepts_stats(function):
+    """
+    Check if get_review_user_weight function accepts stats keyword argument.
+    """
+    review_app = get_review_app_name()
+    try:
+        return _resolved[(review_app, 'weight_stats')]
+    except KeyError:
+        pass
+    try:
+        parameters = signature(function).parameters.values()
+    except (TypeError, ValueError):
+        parameters = ()
+    accepts = any(p.name == 'stats' and p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)
+                  or p.kind == p.VAR_KEYWORD for p in parameters)
+    _resolved[(review_app, 'weight_stats')] = accepts
+    return accepts
+
+
 def get_review_user_weight(user, target):
     """
-    Returns the rating weight for specific user.
+    Returns the rating weight for specific user. If the function of review app
+    accepts stats keyword argument, ReviewerStats of the user are passed to it.
     """
-    if get_review_app_name() != DEFAULT_REVIEW_APP and hasattr(get_review_app(), "get_review_user_weight"):
-        return get_review_app().get_review_user_weight(user, target)
+    function = get_review_app_function("get_review_user_weight")
+    if function is not None:
+        if accepts_stats(function):
+            from reviews.models import ReviewerStats
+            return function(user, target, stats=ReviewerStats.objects.for_user(user))
+        return function(user, target)
     else:
         return 1
+
+
+def clear_review_app_cache():
+    """
+    Forget resolved review app, should be called when review app changes.
+    """
+    _resolved.clear()
+
+
+def review_app_changed(setting, **kwargs):
+    if setting in ('REVIEW_APP', 'INSTALLED_APPS'):
+        clear_review_app_cache()
+
+
+setting_changed.connect(review_app_changed)
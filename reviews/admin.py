@@ -2,10 +2,12 @@ from django import forms
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _, ngettext
 
 from . import get_review_model, DEFAULT_REVIEW_RATING_CHOICES
+from .export import iter_export, iter_gzip
 from .models import Review
 from .widgets import ObjectPkWidget
 
@@ -75,13 +77,15 @@ class ReviewAdmin(admin.ModelAdmin):
     date_hierarchy = 'submit_date'
     raw_id_fields = ('user',)
     search_fields = ('comment', UsernameSearch(), 'ip_address')
-    actions = ['approve_reviews']
+    actions = ['approve_reviews', 'reject_reviews', 'export_reviews_csv', 'export_reviews_jsonl']
 
     def get_actions(self, request):
         actions = super().get_actions(request)
         if not request.user.has_perm('reviews.can_moderate'):
-            if 'approve_reviews' in actions:
-                actions.pop('approve_reviews')
+            # Exports include IP addresses of reviewers
+            for action in ('approve_reviews', 'reject_reviews', 'export_reviews_csv', 'export_reviews_jsonl'):
+                if action in actions:
+                    actions.pop(action)
         return actions
 
     @classmethod
@@ -90,20 +94,45 @@ class ReviewAdmin(admin.ModelAdmin):
         review.save()
 
     def approve_reviews(self, request, queryset):
-        self._bulk_flag(request, queryset, self.perform_approve,
+        self._bulk_flag(request, queryset, 'approve',
                         lambda n: ngettext('approved', 'approved', n))
 
     approve_reviews.short_description = _("Approve selected reviews")
 
+    def reject_reviews(self, request, queryset):
+        self._bulk_flag(request, queryset, 'reject',
+                        lambda n: ngettext('rejected', 'rejected', n))
+
+    reject_reviews.short_description = _("Reject selected reviews")
+
+    def export_reviews_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    export_reviews_csv.short_description = _("Export selected reviews to CSV")
+
+    def export_reviews_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
+    export_reviews_jsonl.short_description = _("Export selected reviews to JSON Lines")
+
+    def _export(self, queryset, format):
+        """
+        Stream gzip compressed export of reviews without loading them all in memory.
+        """
+        response = StreamingHttpResponse(iter_gzip(iter_export(queryset, format)),
+                                         content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="reviews.%s.gz"' % format
+        return response
+
+    def delete_queryset(self, request, queryset):
+        queryset.moderate('delete', request=request)
+
     def _bulk_flag(self, request, queryset, action, done_message):
         """
-        Flag, approve, or remove some comments from an admin action. Actually
-        calls the `action` argument to perform the heavy lifting.
+        Approve, reject or remove some reviews from an admin action. Reviews
+        are updated in batches by ReviewQuerySet.moderate without loading them.
         """
-        n_reviews = 0
-        for review in queryset:
-            action(review)
-            n_reviews += 1
+        n_reviews = len(queryset.moderate(action, request=request))
 
         msg = ngettext('%(count)s review was successfully %(action)s.',
                        '%(count)s reviews were successfully %(action)s.',
@@ -5,3 +5,28 @@ from django.utils.translation import gettext_lazy as _
 class ReviewsAppConfig(AppConfig):
     name = 'reviews'
     verbose_name = _('Reviews')
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+
+        from . import signals
+        from .cache import invalidate_fragments
+        from .moderation import REVIEW_MODERATION_QUEUE, enqueue_review
+        from .models import UserReviewAbstractModel, review_deleted, refresh_review_aggregates
+        from .profanity import get_matcher
+        from .ratings import build_rating_values
+
+        build_rating_values()
+        get_matcher()
+
+        # Connect to concrete review models only, senderless post_delete receivers
+        # would disable fast deletes for all models in the project
+        for model in self.apps.get_models():
+            if issubclass(model, UserReviewAbstractModel):
+                post_delete.connect(review_deleted, sender=model)
+        # Aggregates should be refreshed before cached fragments are invalidated
+        signals.review_target_changed.connect(refresh_review_aggregates)
+        signals.review_target_changed.connect(invalidate_fragments)
+
+        if REVIEW_MODERATION_QUEUE:
+            signals.review_was_posted.connect(enqueue_review)
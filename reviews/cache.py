@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.encoding import force_bytes
+from django.utils.translation import get_language
+
+
+# Cache aliases for rendered review fragments, caching is disabled if not set
+REVIEW_CACHE = getattr(settings, 'REVIEW_CACHE', None)
+REVIEW_LIST_CACHE = getattr(settings, 'REVIEW_LIST_CACHE', None)
+REVIEW_CACHE_TIMEOUT = getattr(settings, 'REVIEW_CACHE_TIMEOUT', 24 * 60 * 60)  # 24h
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_cache_alias(kind):
+    return REVIEW_LIST_CACHE if kind == 'list' else REVIEW_CACHE
+
+
+def get_cache(kind='rating'):
+    """
+    Get cache used for review fragments of some kind or None if caching is disabled.
+    """
+    alias = get_cache_alias(kind)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_stats():
+    """
+    Get {kind: {'hits': number, 'misses': number}} dictionary of fragment cache
+    statistics collected by current process.
+    """
+    with _stats_lock:
+        return {kind: dict(counts) for kind, counts in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def count(kind, hit):
+    with _stats_lock:
+        counts = _stats.setdefault(kind, {'hits': 0, 'misses': 0})
+        counts['hits' if hit else 'misses'] += 1
+
+
+def make_key(prefix, *parts):
+    return 'reviews.%s.%s' % (prefix, hashlib.md5(force_bytes(':'.join(map(str, parts)))).hexdigest())
+
+
+def get_version(cache, target):
+    """
+    Get current version of cached fragments for the (content_type_id, object_pk, site_id) target.
+    """
+    key = make_key('version', *target)
+    version = cache.get(key)
+    if version is None:
+        # Start from current time so that versions are not reused if counter is evicted
+        cache.add(key, int(time.time() * 1000000), None)
+        version = cache.get(key)
+    return version
+
+
+def get_fragment(kind, target, render, *args):
+    """
+    Get fragment of some kind rendered for the target from cache or render it with
+    render() and put to cache. Additional args are included in the cache key.
+    """
+    cache = get_cache(kind)
+    if cache is None:
+        return render()
+    key = make_key(kind, get_version(cache, target), get_language(), *(tuple(target) + args))
+    fragment = cache.get(key)
+    count(kind, fragment is not None)
+    if fragment is None:
+        fragment = render()
+        cache.set(key, fragment, REVIEW_CACHE_TIMEOUT)
+    return fragment
+
+
+def invalidate_fragments(sender, targets, **kwargs):
+    """
+    Bump versions of cached fragments for changed targets, this implicitly
+    invalidates all fragments cached for them.
+    """
+    for alias in {REVIEW_CACHE, REVIEW_LIST_CACHE} - {None}:
+        cache = caches[alias]
+        for target in targets:
+            try:
+                cache.incr(make_key('version', *target))
+            except ValueError:
+                # Nothing was cached for target yet
+                pass
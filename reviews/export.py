@@ -0,0 +1,102 @@
+"""
+Streaming export of reviews to CSV or JSON Lines. Reviews are read as tuples
+with server-side cursor in chunks, so memory use does not depend on the number
+of exported reviews.
+"""
+import csv
+import zlib
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = ('id', 'content_type', 'object_pk', 'user_id', 'site_id', 'rating', 'weight', 'comment',
+                 'submit_date', 'ip_address', 'is_public')
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    File-like object returning written value instead of buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_export_fields(model):
+    """
+    Get names of exported columns available in the review model. Content type
+    is exported as app_label.model, as accepted by import_reviews command.
+    """
+    names = {f.attname for f in model._meta.concrete_fields} | {'content_type'}
+    return [name for name in EXPORT_FIELDS if name in names]
+
+
+def filter_reviews(queryset, site=None, content_types=None, since=None, until=None):
+    """
+    Filter exported reviews by site id, list of content types (app_label.model
+    labels or ContentType instances) and submit date range.
+    """
+    if site is not None:
+        queryset = queryset.filter(site_id=site)
+    if content_types:
+        queryset = queryset.filter(content_type__in=[
+            ctype if isinstance(ctype, ContentType) else ContentType.objects.get_by_natural_key(*ctype.split('.', 1))
+            for ctype in content_types])
+    if since is not None:
+        queryset = queryset.filter(submit_date__gte=since)
+    if until is not None:
+        queryset = queryset.filter(submit_date__lt=until)
+    return queryset
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield exported reviews as tuples of field values.
+    """
+    columns = ['content_type_id' if name == 'content_type' else name for name in fields]
+    ctype_index = fields.index('content_type') if 'content_type' in fields else None
+    labels = {}
+    rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+    for row in rows:
+        if ctype_index is not None:
+            ctype_id = row[ctype_index]
+            label = labels.get(ctype_id)
+            if label is None:
+                ctype = ContentType.objects.get_for_id(ctype_id)
+                label = labels[ctype_id] = '%s.%s' % (ctype.app_label, ctype.model)
+            row = row[:ctype_index] + (label,) + row[ctype_index + 1:]
+        yield row
+
+
+def iter_export(queryset, format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield exported reviews as lines of text in CSV (with header) or JSON Lines format.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format %r" % format)
+    fields = get_export_fields(queryset.model)
+    rows = iter_rows(queryset, fields, chunk_size)
+    if format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def iter_gzip(chunks):
+    """
+    Compress stream of text chunks to stream of gzip data.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -11,6 +11,7 @@ from django.utils import timezone
 from django.utils.translation import ngettext, gettext, gettext_lazy as _
 
 from . import get_review_model, DEFAULT_REVIEW_RATING_CHOICES
+from .profanity import find_profanities
 
 
 REVIEW_MAX_LENGTH = getattr(settings, 'REVIEW_MAX_LENGTH', 3000)
@@ -188,7 +189,7 @@ class ReviewDetailsForm(ReviewSecurityForm):
         """
         comment = self.cleaned_data["comment"]
         if (not getattr(settings, 'REVIEW_ALLOW_PROFANITIES', False) and getattr(settings, 'PROFANITIES_LIST', False)):
-            bad_words = [w for w in settings.PROFANITIES_LIST if w in comment.lower()]
+            bad_words = find_profanities(comment)
             if bad_words:
                 raise forms.ValidationError(ngettext(
                     "Watch your mouth! The word %s is not allowed here.",
@@ -0,0 +1,93 @@
+import gzip
+import time
+from datetime import datetime, time as datetime_time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from reviews.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, filter_reviews, iter_export
+from reviews.registry import get_capabilities
+
+
+def parse_date_option(value):
+    """
+    Parse ISO date or datetime, date is interpreted as start of the day.
+    """
+    date = parse_datetime(value)
+    if date is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError("Invalid date %r" % value)
+        date = datetime.combine(day, datetime_time.min)
+    if settings.USE_TZ and timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Command(BaseCommand):
+    help = "Export reviews to CSV or JSON Lines file, optionally gzip compressed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-',
+                            help="Output file path, standard output by default.")
+        parser.add_argument('--format', choices=EXPORT_FORMATS,
+                            help="Output format, detected by file extension by default.")
+        parser.add_argument('--gzip', action='store_true',
+                            help="Compress output, implied by .gz file extension.")
+        parser.add_argument('--site', type=int, help="Export reviews of the site with given id.")
+        parser.add_argument('--content-type', action='append', dest='content_types', metavar='APP_LABEL.MODEL',
+                            help="Export reviews of given model, can be repeated.")
+        parser.add_argument('--since', help="Export reviews submitted at or after given date.")
+        parser.add_argument('--until', help="Export reviews submitted before given date.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Number of rows fetched from database at once.")
+
+    def handle(self, *args, **options):
+        path = options['output']
+        compress = options['gzip'] or path.endswith('.gz')
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.jsonl.gz')) else 'csv')
+
+        queryset = get_capabilities().model._default_manager.all()
+        try:
+            queryset = filter_reviews(
+                queryset,
+                site=options['site'],
+                content_types=options['content_types'],
+                since=parse_date_option(options['since']) if options['since'] else None,
+                until=parse_date_option(options['until']) if options['until'] else None,
+            )
+        except (ContentType.DoesNotExist, TypeError):
+            raise CommandError("Unknown content type in %s" % ', '.join(options['content_types']))
+
+        if path == '-' and compress:
+            # Compressed data is written to binary buffer of text stream
+            buffer = getattr(self.stdout, 'buffer', None)
+            if buffer is None:
+                raise CommandError("Compressed output needs binary standard output, use --output instead.")
+
+        start = time.monotonic()
+        count = 0
+        if path == '-':
+            stream = gzip.open(buffer, 'wt', encoding='utf-8', newline='') if compress else None
+        elif compress:
+            stream = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            stream = open(path, 'w', encoding='utf-8', newline='')
+        write = stream.write if stream is not None else lambda line: self.stdout.write(line, ending='')
+        try:
+            for line in iter_export(queryset, format, options['chunk_size']):
+                write(line)
+                count += 1
+        finally:
+            if stream is not None:
+                stream.close()
+
+        if format == 'csv':
+            # Header line
+            count -= 1
+        if path != '-' and options['verbosity']:
+            elapsed = time.monotonic() - start
+            self.stdout.write("Exported %d reviews, %.1f rows/s." % (count, count / elapsed if elapsed else 0))
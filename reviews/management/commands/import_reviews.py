@@ -0,0 +1,258 @@
+import csv
+import gzip
+import json
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+
+from reviews import signals
+from reviews.forms import REVIEW_MAX_LENGTH, REVIEW_RATING_CHOICES
+from reviews.models import ReviewerStats
+from reviews.profanity import find_profanities
+from reviews.registry import get_capabilities
+
+
+# Maximum value of PositiveSmallIntegerField on all supported databases
+REVIEW_MAX_WEIGHT = 32767
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Import reviews from CSV or JSON Lines file, optionally gzip compressed. Each row should contain content_type (app_label.model " \
+           "or id), object_pk, rating and comment, and optionally user_id or username, site_id, submit_date, " \
+           "ip_address, is_public and weight."
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Input file path or - for standard input.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help="Input format, detected by file extension by default.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of reviews inserted in one transaction.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.capabilities = get_capabilities()
+        self.content_types = {}
+        self.users = {}
+        self.user_ids = {}
+        self.site_ids = {}
+        self.fields = {f.name for f in self.capabilities.model._meta.concrete_fields}
+        batch_size = options['batch_size']
+        path = options['file']
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json', '.jsonl.gz')) else 'csv')
+
+        self.imported = self.skipped = 0
+        self.start = time.monotonic()
+        targets = set()
+        batch = []
+        if path == '-':
+            stream = sys.stdin
+        elif path.endswith('.gz'):
+            stream = gzip.open(path, 'rt', encoding='utf-8', newline='')
+        else:
+            stream = open(path, encoding='utf-8', newline='')
+        try:
+            for line, row in self.read_rows(stream, format):
+                try:
+                    review = self.build_review(row)
+                except RowError as e:
+                    self.skipped += 1
+                    self.stderr.write("Row %d skipped: %s" % (line, e))
+                    continue
+                batch.append(review)
+                if len(batch) >= batch_size:
+                    self.save_batch(batch, targets)
+                    batch = []
+            if batch:
+                self.save_batch(batch, targets)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # bulk_create does not call save(), so rating aggregates and cached fragments are refreshed
+            # once for all objects of committed batches, even if a later batch failed
+            if targets:
+                signals.send_target_changed(self.capabilities.model, targets)
+
+        if self.verbosity:
+            self.stdout.write("Imported %d reviews, skipped %d rows, %.1f rows/s." % (
+                self.imported, self.skipped, self.get_rate()))
+
+    def read_rows(self, stream, format):
+        if format == 'csv':
+            # Header is line 1
+            yield from enumerate(csv.DictReader(stream), 2)
+        else:
+            for line, data in enumerate(stream, 1):
+                if not data.strip():
+                    continue
+                try:
+                    row = json.loads(data)
+                except ValueError:
+                    row = None
+                yield line, row
+
+    def get_rate(self):
+        elapsed = time.monotonic() - self.start
+        return (self.imported + self.skipped) / elapsed if elapsed else 0
+
+    def save_batch(self, batch, targets):
+        with transaction.atomic():
+            self.capabilities.model._default_manager.bulk_create(batch)
+            if self.capabilities.has_aggregates:
+                # bulk_create does not call save(), user statistics are updated once per batch
+                deltas = {}
+                for review in batch:
+                    user_id, contribution = review.get_stats_contribution()
+                    deltas[user_id] = tuple(a + b for a, b in zip(deltas.get(user_id, (0, 0, 0)), contribution))
+                ReviewerStats.objects.apply(deltas)
+        targets.update(self.get_target_key(review) for review in batch)
+        self.imported += len(batch)
+        if self.verbosity > 1:
+            self.stdout.write("Imported %d reviews, %.1f rows/s" % (self.imported, self.get_rate()))
+
+    @staticmethod
+    def get_target_key(review):
+        """
+        Get (content_type_id, object_pk, site_id) target of the review, reviews
+        of models without site are rendered for the current site.
+        """
+        site_id = getattr(review, 'site_id', getattr(settings, 'SITE_ID', None))
+        return review.content_type_id, force_str(review.object_pk), site_id
+
+    def get_content_type(self, value):
+        value = force_str(value).strip()
+        ctype = self.content_types.get(value)
+        if ctype is None:
+            try:
+                if value.isdigit():
+                    ctype = ContentType.objects.get_for_id(int(value))
+                else:
+                    ctype = ContentType.objects.get_by_natural_key(*value.split('.', 1))
+            except (ContentType.DoesNotExist, TypeError):
+                raise RowError("unknown content type %r" % value)
+            self.content_types[value] = ctype
+        return ctype
+
+    def get_user_id(self, username):
+        if username not in self.users:
+            User = get_user_model()
+            self.users[username] = User._default_manager.filter(
+                **{User.USERNAME_FIELD: username}).values_list('pk', flat=True).first()
+        if self.users[username] is None:
+            raise RowError("unknown user %r" % username)
+        return self.users[username]
+
+    def clean_user_id(self, value):
+        """
+        Check that the user exists, an unknown id would fail the whole batch.
+        """
+        try:
+            user_id = get_user_model()._meta.pk.to_python(value)
+        except ValidationError:
+            raise RowError("invalid user_id %r" % value)
+        if user_id not in self.user_ids:
+            self.user_ids[user_id] = get_user_model()._default_manager.filter(pk=user_id).exists()
+        if not self.user_ids[user_id]:
+            raise RowError("unknown user_id %r" % value)
+        return user_id
+
+    def clean_site_id(self, value):
+        try:
+            site_id = int(value)
+        except (TypeError, ValueError):
+            raise RowError("invalid site_id %r" % value)
+        if site_id not in self.site_ids:
+            self.site_ids[site_id] = Site.objects.filter(pk=site_id).exists()
+        if not self.site_ids[site_id]:
+            raise RowError("unknown site_id %r" % value)
+        return site_id
+
+    def clean_weight(self, value):
+        try:
+            weight = int(value)
+        except (TypeError, ValueError):
+            raise RowError("invalid weight %r" % value)
+        if weight < 0 or weight > REVIEW_MAX_WEIGHT:
+            raise RowError("weight should be between 0 and %d" % REVIEW_MAX_WEIGHT)
+        return weight
+
+    def clean_ip_address(self, value):
+        try:
+            return self.capabilities.model._meta.get_field('ip_address').clean(force_str(value).strip(), None)
+        except ValidationError:
+            raise RowError("invalid ip_address %r" % value)
+
+    def clean_rating(self, value):
+        try:
+            rating = int(value)
+        except (TypeError, ValueError):
+            raise RowError("invalid rating %r" % value)
+        if rating < 1 or rating > len(REVIEW_RATING_CHOICES):
+            raise RowError("rating should be between %d and %d" % (1, len(REVIEW_RATING_CHOICES)))
+        return rating
+
+    def clean_comment(self, value):
+        """
+        Same rules as in ReviewDetailsForm.
+        """
+        comment = force_str(value or '').strip()
+        if not comment:
+            raise RowError("comment is empty")
+        if len(comment) > REVIEW_MAX_LENGTH:
+            raise RowError("comment is longer than %d characters" % REVIEW_MAX_LENGTH)
+        if not getattr(settings, 'REVIEW_ALLOW_PROFANITIES', False):
+            bad_words = find_profanities(comment)
+            if bad_words:
+                raise RowError("comment contains %s" % ', '.join(bad_words))
+        return comment
+
+    def build_review(self, row):
+        if not isinstance(row, dict):
+            raise RowError("not a JSON object")
+        if not row.get('object_pk'):
+            raise RowError("object_pk is empty")
+        data = {
+            'content_type': self.get_content_type(row.get('content_type', '')),
+            'object_pk': force_str(row['object_pk']),
+            'rating': self.clean_rating(row.get('rating')),
+            'comment': self.clean_comment(row.get('comment')),
+        }
+        if row.get('weight') not in (None, ''):
+            data['weight'] = self.clean_weight(row['weight'])
+        if self.capabilities.has_user:
+            if row.get('user_id') not in (None, ''):
+                data['user_id'] = self.clean_user_id(row['user_id'])
+            elif row.get('username'):
+                data['user_id'] = self.get_user_id(row['username'])
+        if self.capabilities.has_site:
+            data['site_id'] = self.clean_site_id(row.get('site_id') or settings.SITE_ID)
+        if self.capabilities.has_is_public and row.get('is_public') not in (None, ''):
+            data['is_public'] = force_str(row['is_public']).lower() in ('1', 'true', 'yes')
+        if 'ip_address' in self.fields:
+            data['ip_address'] = self.clean_ip_address(row['ip_address']) if row.get('ip_address') else None
+        if 'submit_date' in self.fields:
+            submit_date = row.get('submit_date')
+            if submit_date:
+                try:
+                    submit_date = parse_datetime(submit_date)
+                except ValueError:
+                    submit_date = None
+                if submit_date is None:
+                    raise RowError("invalid submit_date %r" % row['submit_date'])
+                if settings.USE_TZ and timezone.is_naive(submit_date):
+                    submit_date = timezone.make_aware(submit_date)
+            data['submit_date'] = submit_date or timezone.now()
+        return self.capabilities.model(**data)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from reviews import moderation
+
+
+class Command(BaseCommand):
+    help = "Process reviews in the moderation queue with a pool of worker threads or processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Number of workers.")
+        parser.add_argument('--processes', action='store_true', help="Use worker processes instead of threads.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Number of tasks claimed at once.")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--interval', type=float, default=5,
+                            help="Seconds to wait before polling empty queue again.")
+
+    def report(self, stats):
+        if self.verbosity > 1:
+            self.stdout.write(
+                "processed: {processed}, {throughput:.1f} reviews/s, pending: {pending}, lag: {lag:.1f}s, "
+                "approved: {approved}, flagged: {flagged}, failed: {failed}".format(**stats))
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        processed = moderation.run(workers=options['workers'], processes=options['processes'],
+                                   batch_size=options['batch_size'], once=options['once'],
+                                   interval=options['interval'], report=self.report)
+        if self.verbosity:
+            self.stdout.write("Moderated %d reviews." % processed)
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from reviews.models import RatingPrior, ReviewAggregate, ReviewerStats
+from reviews.ratings import bayesian_average, wilson_score
+from reviews.registry import get_capabilities
+
+
+class Command(BaseCommand):
+    help = "Rebuild rating aggregates and reviewer statistics from all reviews of the review app."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of rows inserted with one query.")
+
+    def handle(self, *args, **options):
+        capabilities = get_capabilities()
+        if not capabilities.has_aggregates:
+            raise CommandError("Review model %s does not maintain rating statistics." % capabilities.model._meta.label)
+        queryset = capabilities.model._default_manager.order_by()
+        with transaction.atomic():
+            aggregates = self.rebuild_aggregates(queryset, options['batch_size'])
+            stats = self.rebuild_stats(queryset, options['batch_size'])
+        if options['verbosity']:
+            self.stdout.write("Rebuilt rating aggregates of %d objects and statistics of %d reviewers." % (
+                aggregates, stats))
+
+    def rebuild_aggregates(self, queryset, batch_size):
+        """
+        Replace all rating aggregates with ones calculated from public reviews
+        with one grouped query.
+        """
+        size = ReviewAggregate.histogram_size()
+        aggregates = {}
+        rows = queryset.filter(is_public=True).values_list(
+            'content_type_id', 'object_pk', 'site_id', 'rating').annotate(Count('pk'), Sum('weight'))
+        for content_type_id, object_pk, site_id, rating, count, weight in rows.iterator():
+            aggregate = aggregates.get((content_type_id, object_pk, site_id))
+            if aggregate is None:
+                aggregate = ReviewAggregate(content_type_id=content_type_id, object_pk=object_pk, site_id=site_id)
+                aggregate.histogram = [0] * size
+                aggregates[content_type_id, object_pk, site_id] = aggregate
+            aggregate.review_count += count
+            aggregate.rating_sum += rating * weight
+            aggregate.weight_sum += weight
+            if 0 < rating <= size:
+                aggregate.histogram[rating - 1] = count
+
+        priors = RatingPrior.objects.get_priors({key[0] for key in aggregates})
+        for (content_type_id, object_pk, site_id), aggregate in aggregates.items():
+            aggregate.histogram = ','.join(map(str, aggregate.histogram))
+            aggregate.bayesian_average = bayesian_average(aggregate.rating_sum, aggregate.weight_sum,
+                                                          *priors[content_type_id])
+            aggregate.wilson_score = wilson_score(aggregate.average_rating, aggregate.review_count)
+        ReviewAggregate.objects.all().delete()
+        ReviewAggregate.objects.bulk_create(aggregates.values(), batch_size=batch_size)
+        return len(aggregates)
+
+    def rebuild_stats(self, queryset, batch_size):
+        """
+        Replace all reviewer statistics with ones calculated from reviews with
+        one grouped query.
+        """
+        rows = queryset.filter(user__isnull=False).values('user_id').annotate(
+            count=Count('pk'), approved=Count('pk', filter=Q(is_public=True)), rating_sum=Sum('rating'),
+        ).values_list('user_id', 'count', 'approved', 'rating_sum')
+        stats = [ReviewerStats(user_id=user_id, review_count=count, approved_count=approved, rating_sum=rating_sum)
+                 for user_id, count, approved, rating_sum in rows.iterator()]
+        ReviewerStats.objects.all().delete()
+        ReviewerStats.objects.bulk_create(stats, batch_size=batch_size)
+        return len(stats)
@@ -0,0 +1,119 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.encoding import force_str
+
+from reviews import signals, get_review_user_weight
+from reviews.registry import get_capabilities
+
+
+class Command(BaseCommand):
+    help = "Recalculate weights of existing reviews with get_review_user_weight of the review app."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Number of reviews processed in one transaction.")
+        parser.add_argument('--checkpoint', metavar='FILE',
+                            help="File storing primary key of the last processed review, processing is "
+                                 "resumed from it if the file exists.")
+        parser.add_argument('--after', type=int, default=None,
+                            help="Process reviews with primary key greater than given.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.capabilities = get_capabilities()
+        checkpoint = options['checkpoint']
+        after = options['after']
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                try:
+                    after = int(f.read().strip())
+                except ValueError:
+                    raise CommandError("Invalid checkpoint file %s" % checkpoint)
+            if self.verbosity:
+                self.stdout.write("Resuming after review %d" % after)
+
+        queryset = self.capabilities.model._default_manager.order_by('pk')
+        columns = ['pk', 'content_type_id', 'object_pk', 'weight']
+        columns += ['user_id'] if self.capabilities.has_user else []
+        columns += ['site_id', 'is_public'] if self.capabilities.has_aggregates else []
+
+        processed = updated = 0
+        start = time.monotonic()
+        while True:
+            chunk = queryset.filter(pk__gt=after) if after is not None else queryset
+            rows = list(chunk.values(*columns)[:options['chunk_size']])
+            if not rows:
+                break
+            updated += self.process_chunk(rows)
+            processed += len(rows)
+            after = rows[-1]['pk']
+            if checkpoint:
+                with open(checkpoint, 'w') as f:
+                    f.write(str(after))
+            if self.verbosity > 1:
+                elapsed = time.monotonic() - start
+                self.stdout.write("Processed %d reviews, updated %d, %.1f rows/s" % (
+                    processed, updated, processed / elapsed if elapsed else 0))
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        if self.verbosity:
+            self.stdout.write("Recalculated weights of %d reviews, updated %d." % (processed, updated))
+
+    def get_targets(self, rows):
+        """
+        Load reviewed objects of the chunk with one query per content type.
+        """
+        pks = {}
+        for row in rows:
+            pks.setdefault(row['content_type_id'], set()).add(row['object_pk'])
+        targets = {}
+        for ctype_id, object_pks in pks.items():
+            model = ContentType.objects.get_for_id(ctype_id).model_class()
+            if model is None:
+                continue
+            for pk, obj in model._default_manager.in_bulk(list(object_pks)).items():
+                targets[ctype_id, force_str(pk)] = obj
+        return targets
+
+    def process_chunk(self, rows):
+        """
+        Evaluate weight once per distinct (user, target) pair of the chunk and
+        save changed weights with bulk_update. Returns number of updated reviews.
+        """
+        targets = self.get_targets(rows)
+        user_ids = {row['user_id'] for row in rows if row.get('user_id') is not None}
+        users = get_user_model()._default_manager.in_bulk(user_ids) if user_ids else {}
+        anonymous = AnonymousUser()
+
+        weights = {}
+        changed = []
+        changed_targets = set()
+        Model = self.capabilities.model
+        for row in rows:
+            target = targets.get((row['content_type_id'], force_str(row['object_pk'])))
+            if target is None:
+                # Reviewed object was deleted
+                continue
+            user_id = row.get('user_id')
+            key = (user_id, row['content_type_id'], force_str(row['object_pk']))
+            if key not in weights:
+                weights[key] = get_review_user_weight(users.get(user_id, anonymous), target)
+            if weights[key] != row['weight']:
+                changed.append(Model(pk=row['pk'], weight=weights[key]))
+                if row.get('is_public'):
+                    changed_targets.add((row['content_type_id'], force_str(row['object_pk']), row['site_id']))
+
+        if changed:
+            with transaction.atomic():
+                Model._default_manager.bulk_update(changed, ['weight'])
+                # Only aggregates of objects with changed public reviews are refreshed
+                if changed_targets:
+                    signals.send_target_changed(Model, changed_targets)
+        return len(changed)
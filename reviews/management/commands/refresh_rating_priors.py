@@ -0,0 +1,25 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.models import RatingPrior
+
+
+class Command(BaseCommand):
+    help = "Recalculate priors of Bayesian average rating per content type and rescore rating aggregates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--content-type', action='append', dest='content_types', metavar='APP_LABEL.MODEL',
+                            help="Refresh prior of given model only, can be repeated.")
+
+    def handle(self, *args, **options):
+        content_types = None
+        if options['content_types']:
+            try:
+                content_types = [ContentType.objects.get_by_natural_key(*label.split('.', 1))
+                                 for label in options['content_types']]
+            except (ContentType.DoesNotExist, TypeError):
+                raise CommandError("Unknown content type in %s" % ', '.join(options['content_types']))
+        priors = RatingPrior.objects.refresh(content_types)
+        if options['verbosity']:
+            for ctype_id, (mean, weight) in sorted(priors.items()):
+                self.stdout.write("%s: mean %.3f, weight %.2f" % (ContentType.objects.get_for_id(ctype_id), mean, weight))
@@ -1,9 +1,238 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Avg, Count, Sum, F, FloatField, Q
+from django.db.models.functions import Cast
+from django.db.models.query import ValuesListIterable
 from django.contrib.contenttypes.models import ContentType
-from django.utils.encoding import force_str
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+
+from . import signals
+
+
+REVIEW_LIST_PAGE_SIZE = getattr(settings, 'REVIEW_LIST_PAGE_SIZE', 20)
+REVIEW_MODERATION_BATCH_SIZE = getattr(settings, 'REVIEW_MODERATION_BATCH_SIZE', 500)
+
+
+def get_objects_ctype_pks(objects):
+    """
+    Get content type and {object_pk: pk} mapping for a list of objects of the same model.
+    """
+    pks = {force_str(obj._get_pk_val()): obj._get_pk_val() for obj in objects}
+    if not pks:
+        return None, pks
+    return ContentType.objects.get_for_model(objects[0]), pks
+
+
+async def aget_content_type(model):
+    """
+    Get content type for a model or an instance in async context, content types
+    are usually cached and are returned without switching to a thread.
+    """
+    # Imported here, async support needs Django 4.2+ unlike the rest of the app
+    from asgiref.sync import sync_to_async
+    from django.core.exceptions import SynchronousOnlyOperation
+
+    try:
+        return ContentType.objects.get_for_model(model)
+    except SynchronousOnlyOperation:
+        return await sync_to_async(ContentType.objects.get_for_model)(model)
+
+
+async def aget_objects_ctype_pks(objects):
+    """
+    Async version of get_objects_ctype_pks accepting list or QuerySet of objects.
+    """
+    if isinstance(objects, models.QuerySet):
+        queryset, objects = objects, []
+        async for obj in queryset:
+            objects.append(obj)
+    else:
+        objects = list(objects)
+    pks = {force_str(obj._get_pk_val()): obj._get_pk_val() for obj in objects}
+    if not pks:
+        return None, pks
+    return await aget_content_type(objects[0]), pks
+
+
+class ReviewRecord:
+    """
+    Lightweight read-only review with the fields rendered by review lists.
+    The user is represented by the username (USERNAME_FIELD of the user
+    model, or primary key if it has none) instead of str(user).
+    """
+    __slots__ = ('id', 'rating', 'weight', 'comment', 'submit_date', 'user')
+
+    def __init__(self, id, rating, weight, comment, submit_date=None, user=None):
+        self.id = id
+        self.rating = rating
+        self.weight = weight
+        self.comment = comment
+        self.submit_date = submit_date
+        self.user = user
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return '<ReviewRecord: %s>' % self.id
+
+
+def get_record_columns(model):
+    """
+    Get {ReviewRecord attribute: column lookup} mapping of fields the review
+    model has.
+    """
+    names = {f.name for f in model._meta.get_fields()}
+    columns = {'id': 'pk', 'rating': 'rating', 'weight': 'weight', 'comment': 'comment'}
+    if 'submit_date' in names:
+        columns['submit_date'] = 'submit_date'
+    if 'user' in names:
+        user_model = model._meta.get_field('user').related_model
+        columns['user'] = 'user__%s' % getattr(user_model, 'USERNAME_FIELD', 'pk')
+    return columns
+
+
+class ReviewRecordIterable(ValuesListIterable):
+    """
+    Yield ReviewRecord for each row of the QuerySet.
+    """
+
+    def __iter__(self):
+        # Columns are named by attributes, except primary key and user lookups
+        names = ['id' if column == 'pk' else column.split('__', 1)[0] for column in self.queryset._fields]
+        for row in super().__iter__():
+            yield ReviewRecord(**dict(zip(names, row)))
+
+
+class ReviewQuerySet(models.QuerySet):
+    def records(self):
+        """
+        QuerySet of ReviewRecord instances fetching only the columns rendered by
+        review lists, without building model instances and related users.
+        """
+        clone = self.values_list(*get_record_columns(self.model).values())
+        clone._iterable_class = ReviewRecordIterable
+        return clone
+
+    def seek(self, after=None, limit=REVIEW_LIST_PAGE_SIZE):
+        """
+        Keyset pagination: QuerySet of at most limit reviews ordered from newest
+        to oldest following the review identified by after cursor (as returned
+        by get_cursor). The cost of a page does not depend on its depth.
+        """
+        qs = self.order_by('-submit_date', '-pk')
+        if after:
+            submit_date, pk = self.parse_cursor(after)
+            qs = qs.filter(Q(submit_date__lt=submit_date) | Q(submit_date=submit_date, pk__lt=pk))
+        return qs[:limit]
 
+    def moderate(self, action, request=None, batch_size=REVIEW_MODERATION_BATCH_SIZE):
+        """
+        Approve, reject or delete reviews in the QuerySet with one statement per
+        batch_size reviews, without calling save() for each review. Each batch is
+        committed separately. Statistics of objects and users affected by
+        committed batches are refreshed once on exit, also if some batch fails.
+        reviews_moderated signal is sent once after all batches succeeded.
+        Returns list of primary keys of affected reviews, reviews moderated
+        concurrently by someone else are not included.
+        """
+        if action == 'approve':
+            state = {'is_public': False}
+        elif action == 'reject':
+            state = {'is_public': True}
+        elif action == 'delete':
+            state = {}
+        else:
+            raise ValueError("Unknown moderation action: %r" % action)
+
+        from .models import ReviewerStats
+
+        rows = list(self.filter(**state).order_by().values_list(
+            'pk', 'content_type_id', 'object_pk', 'site_id', 'user_id'))
+        pks = []
+        manager = self.model._default_manager.db_manager(self.db)
+        change = 1 if action == 'approve' else -1
+        # Changes of committed batches are flushed on exit even if a later batch fails
+        with signals.batch_target_changes(), ReviewerStats.objects.batch():
+            for start in range(0, len(rows), batch_size):
+                batch_rows = rows[start:start + batch_size]
+                batch = manager.filter(pk__in=[row[0] for row in batch_rows], **state)
+                with transaction.atomic(using=self.db):
+                    if action == 'delete':
+                        # Statistics are updated by post_delete receiver
+                        batch.delete()
+                    else:
+                        # Reviews moderated concurrently since they were selected are skipped,
+                        # so that their statistics are not changed twice
+                        changed = set(batch.select_for_update().values_list('pk', flat=True))
+                        batch_rows = [row for row in batch_rows if row[0] in changed]
+                        manager.filter(pk__in=changed, **state).update(is_public=action == 'approve')
+                if action != 'delete':
+                    deltas = {}
+                    for row in batch_rows:
+                        deltas[row[4]] = (0, deltas.get(row[4], (0, 0, 0))[1] + change, 0)
+                    ReviewerStats.objects.apply(deltas)
+                pks.extend(row[0] for row in batch_rows)
+                signals.send_target_changed(self.model, {(ct, force_str(pk), site)
+                                                         for _, ct, pk, site, _ in batch_rows})
+        signals.reviews_moderated.send(sender=self.model, reviews=pks, action=action, request=request)
+        return pks
+
+    async def aseek(self, after=None, limit=REVIEW_LIST_PAGE_SIZE):
+        """
+        Async version of seek returning list of reviews.
+        """
+        reviews = []
+        async for review in self.seek(after, limit):
+            reviews.append(review)
+        return reviews
+
+    def rating_summary(self):
+        """
+        RatingSummary (count, weighted average and histogram) of reviews in the QuerySet.
+        """
+        from .ratings import summarize_ratings
+        return summarize_ratings(self)
+
+    async def arating_summary(self):
+        """
+        Async version of rating_summary.
+        """
+        from .ratings import asummarize_ratings
+        return await asummarize_ratings(self)
+
+    @staticmethod
+    def get_cursor(review):
+        """
+        Get opaque cursor pointing to the review for keyset pagination.
+        """
+        return urlsafe_base64_encode(force_bytes('%s|%s' % (review.submit_date.isoformat(), review.pk)))
 
-class ReviewManager(models.Manager):
+    def parse_cursor(self, cursor):
+        """
+        Get (submit_date, pk) tuple from cursor, raises ValueError if cursor is malformed.
+        """
+        try:
+            submit_date, pk = force_str(urlsafe_base64_decode(cursor)).split('|', 1)
+            submit_date = parse_datetime(submit_date)
+            pk = self.model._meta.pk.to_python(pk)
+        except (TypeError, ValueError, UnicodeDecodeError, ValidationError):
+            raise ValueError("Malformed cursor: %r" % cursor)
+        if submit_date is None:
+            raise ValueError("Malformed cursor: %r" % cursor)
+        return submit_date, pk
+
+
+class ReviewManager(models.Manager.from_queryset(ReviewQuerySet)):
     def in_moderation(self):
         """
         QuerySet for all reviews currently in the moderation queue.
@@ -20,3 +249,293 @@ class ReviewManager(models.Manager):
         if isinstance(model, models.Model):
             qs = qs.filter(object_pk=force_str(model._get_pk_val()))
         return qs
+
+    def ratings_for(self, objects, site=None):
+        """
+        Dictionary of {pk: (review count, weighted average rating)} for a list or
+        QuerySet of objects of the same model, calculated with single query over
+        public reviews.
+        """
+        objects = list(objects)
+        ctype, pks = get_objects_ctype_pks(objects)
+        ratings = {pk: (0, None) for pk in pks.values()}
+        if not pks:
+            return ratings
+        for object_pk, count, average in self.get_ratings_rows(ctype, pks, site):
+            ratings[pks[object_pk]] = (count, average)
+        return ratings
+
+    async def aratings_for(self, objects, site=None):
+        """
+        Async version of ratings_for.
+        """
+        ctype, pks = await aget_objects_ctype_pks(objects)
+        ratings = {pk: (0, None) for pk in pks.values()}
+        if not pks:
+            return ratings
+        async for object_pk, count, average in self.get_ratings_rows(ctype, pks, site):
+            ratings[pks[object_pk]] = (count, average)
+        return ratings
+
+    def get_ratings_rows(self, ctype, pks, site):
+        qs = self.get_queryset().filter(content_type=ctype, object_pk__in=list(pks), is_public=True)
+        if site is not None:
+            qs = qs.filter(site=site)
+        return qs.order_by().values('object_pk').annotate(
+            count=Count('pk'),
+            average_rating=Cast(Sum(F('rating') * F('weight')), FloatField()) / Cast(Sum('weight'), FloatField())
+        ).values_list('object_pk', 'count', 'average_rating')
+
+
+class ReviewAggregateManager(models.Manager):
+    def lookup(self, content_type, object_pk, site_id):
+        """
+        Get rating aggregate for an object or None if object has no public reviews.
+        """
+        try:
+            return self.get_queryset().get(content_type=content_type, object_pk=force_str(object_pk),
+                                           site_id=site_id)
+        except self.model.DoesNotExist:
+            return None
+
+    async def alookup(self, content_type, object_pk, site_id):
+        """
+        Async version of lookup.
+        """
+        return await self.get_queryset().filter(content_type=content_type, object_pk=force_str(object_pk),
+                                                site_id=site_id).afirst()
+
+    def ratings_for(self, objects, site):
+        """
+        Dictionary of {pk: (review count, weighted average rating)} for a list or
+        QuerySet of objects of the same model read from aggregates with single query.
+        """
+        objects = list(objects)
+        ctype, pks = get_objects_ctype_pks(objects)
+        ratings = {pk: (0, None) for pk in pks.values()}
+        if not pks:
+            return ratings
+        for aggregate in self.get_queryset().filter(content_type=ctype, object_pk__in=list(pks), site=site):
+            ratings[pks[aggregate.object_pk]] = (aggregate.review_count, aggregate.average_rating)
+        return ratings
+
+    async def aratings_for(self, objects, site):
+        """
+        Async version of ratings_for.
+        """
+        ctype, pks = await aget_objects_ctype_pks(objects)
+        ratings = {pk: (0, None) for pk in pks.values()}
+        if not pks:
+            return ratings
+        async for aggregate in self.get_queryset().filter(content_type=ctype, object_pk__in=list(pks), site=site):
+            ratings[pks[aggregate.object_pk]] = (aggregate.review_count, aggregate.average_rating)
+        return ratings
+
+    def top_rated(self, model, site, score='bayesian_average'):
+        """
+        QuerySet of aggregates for objects of the model (class or content type)
+        ordered by confidence adjusted score: 'bayesian_average' or 'wilson_score'.
+        """
+        if score not in ('bayesian_average', 'wilson_score'):
+            raise ValueError("Unknown score: %r" % score)
+        ctype = model if isinstance(model, ContentType) else ContentType.objects.get_for_model(model)
+        return self.get_queryset().filter(content_type=ctype, site=site).order_by(F(score).desc(nulls_last=True))
+
+    def rescore(self, content_type, prior_mean, prior_weight):
+        """
+        Recalculate Bayesian average and Wilson score of all aggregates for the
+        content type with single UPDATE statement.
+        """
+        from .ratings import score_expressions
+
+        qs = self.get_queryset().filter(content_type=content_type)
+        qs.filter(weight_sum=0).update(bayesian_average=None, wilson_score=None)
+        return qs.filter(weight_sum__gt=0).update(**score_expressions(prior_mean, prior_weight))
+
+    def refresh(self, review_model, targets):
+        """
+        Recalculate aggregates for given (content_type_id, object_pk, site_id) targets
+        from public reviews of review_model.
+        """
+        from .models import RatingPrior
+        from .ratings import bayesian_average, wilson_score
+
+        priors = RatingPrior.objects.get_priors({target[0] for target in targets})
+        for content_type_id, object_pk, site_id in targets:
+            object_pk = force_str(object_pk)
+            rows = review_model._default_manager.filter(
+                content_type_id=content_type_id,
+                object_pk=object_pk,
+                site_id=site_id,
+                is_public=True
+            ).order_by().values_list('rating').annotate(Count('pk'), Sum('weight'))
+
+            histogram = [0] * self.model.histogram_size()
+            review_count = rating_sum = weight_sum = 0
+            for rating, count, weight in rows:
+                review_count += count
+                rating_sum += rating * weight
+                weight_sum += weight
+                if 0 < rating <= len(histogram):
+                    histogram[rating - 1] = count
+
+            lookup = {'content_type_id': content_type_id, 'object_pk': object_pk, 'site_id': site_id}
+            if review_count:
+                average = rating_sum / weight_sum if weight_sum else None
+                self.get_queryset().update_or_create(defaults={
+                    'review_count': review_count,
+                    'rating_sum': rating_sum,
+                    'weight_sum': weight_sum,
+                    'histogram': ','.join(map(str, histogram)),
+                    'bayesian_average': bayesian_average(rating_sum, weight_sum, *priors[content_type_id]),
+                    'wilson_score': wilson_score(average, review_count),
+                }, **lookup)
+            else:
+                self.get_queryset().filter(**lookup).delete()
+
+
+class ModerationTaskManager(models.Manager):
+    def enqueue(self, review):
+        """
+        Put review to the moderation queue.
+        """
+        return self.create(review_type=ContentType.objects.get_for_model(review), review_pk=force_str(review.pk))
+
+    def claim(self, worker, batch_size, timeout=600, max_attempts=3):
+        """
+        Mark at most batch_size oldest pending tasks as being processed by the
+        worker and return them. Tasks are claimed by conditional update, so
+        concurrent workers never get the same task. Tasks processed for more
+        than timeout seconds are considered abandoned by a crashed worker and
+        are claimed again, or failed once they were attempted max_attempts times.
+        """
+        now = timezone.now()
+        stale = Q(status=self.model.PROCESSING, started__lt=now - timedelta(seconds=timeout))
+        self.get_queryset().filter(stale, attempts__gte=max_attempts).update(
+            status=self.model.FAILED, finished=now, reason="Processing timed out")
+        available = Q(status=self.model.PENDING) & (Q(retry_at__isnull=True) | Q(retry_at__lte=now)) | stale
+        pks = list(self.get_queryset().filter(available).order_by('created')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return []
+        self.get_queryset().filter(available, pk__in=pks).update(
+            status=self.model.PROCESSING, worker=worker, started=now, attempts=F('attempts') + 1)
+        return list(self.get_queryset().filter(pk__in=pks, status=self.model.PROCESSING, worker=worker,
+                                               started=now))
+
+    def stats(self):
+        """
+        Get queue statistics: number of tasks by status and lag (age of the oldest
+        pending task) in seconds.
+        """
+        counts = dict(self.get_queryset().order_by().values_list('status').annotate(Count('pk')))
+        stats = {name: counts.get(status, 0) for status, name in self.model.STATUS_NAMES.items()}
+        oldest = self.get_queryset().filter(status=self.model.PENDING).order_by('created') \
+            .values_list('created', flat=True).first()
+        stats['lag'] = (timezone.now() - oldest).total_seconds() if oldest else 0
+        return stats
+
+
+class ReviewerStatsManager(models.Manager):
+    _batch = threading.local()
+
+    def for_user(self, user):
+        """
+        Get statistics of the user, unsaved empty statistics are returned for
+        anonymous users and users without reviews.
+        """
+        if user is None or not user.is_authenticated:
+            return self.model()
+        try:
+            return self.get_queryset().get(pk=user.pk)
+        except self.model.DoesNotExist:
+            return self.model(user=user)
+
+    def apply(self, deltas):
+        """
+        Add {user_id: (reviews, approved reviews, rating sum)} deltas to user
+        statistics with one UPDATE per user, or postpone it if called inside
+        batch block.
+        """
+        batch = getattr(self._batch, 'deltas', None)
+        if batch is not None:
+            for user_id, delta in deltas.items():
+                batch[user_id] = tuple(a + b for a, b in zip(batch.get(user_id, (0, 0, 0)), delta))
+            return
+        for user_id, (reviews, approved, rating_sum) in deltas.items():
+            if user_id is None or not any((reviews, approved, rating_sum)):
+                continue
+            qs = self.get_queryset().filter(pk=user_id)
+            values = {
+                'review_count': F('review_count') + reviews,
+                'approved_count': F('approved_count') + approved,
+                'rating_sum': F('rating_sum') + rating_sum,
+            }
+            if qs.update(**values):
+                continue
+            try:
+                with transaction.atomic(using=self.db):
+                    self.get_queryset().create(user_id=user_id, review_count=max(reviews, 0),
+                                               approved_count=max(approved, 0), rating_sum=max(rating_sum, 0))
+            except IntegrityError:
+                # Created concurrently
+                qs.update(**values)
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect statistics changes inside the block and apply them once on exit.
+        """
+        if getattr(self._batch, 'deltas', None) is not None:
+            yield
+            return
+        self._batch.deltas = {}
+        try:
+            yield
+        finally:
+            # Changes made before an exception are committed too, so they are applied anyway
+            deltas, self._batch.deltas = self._batch.deltas, None
+            self.apply(deltas)
+
+
+class RatingPriorManager(models.Manager):
+    def get_priors(self, content_type_ids):
+        """
+        Get {content_type_id: (mean, weight)} priors of Bayesian average, default
+        prior is used for content types without calculated prior.
+        """
+        from .ratings import default_prior
+
+        priors = dict.fromkeys(content_type_ids, default_prior())
+        if priors:
+            priors.update((ctype_id, (mean, weight)) for ctype_id, mean, weight in self.get_queryset().filter(
+                content_type_id__in=list(priors)).values_list('content_type_id', 'mean', 'weight'))
+        return priors
+
+    def refresh(self, content_types=None):
+        """
+        Calculate priors from aggregates of given content types (all by default)
+        and rescore their aggregates. Prior mean is the weighted average rating of
+        all objects of a content type, prior weight is the average weight sum of
+        an object. REVIEW_BAYESIAN_PRIOR_MEAN and REVIEW_BAYESIAN_PRIOR_WEIGHT
+        settings override calculated values.
+        """
+        from .models import ReviewAggregate
+        from .ratings import REVIEW_BAYESIAN_PRIOR_MEAN, REVIEW_BAYESIAN_PRIOR_WEIGHT
+
+        qs = ReviewAggregate.objects.filter(weight_sum__gt=0)
+        if content_types is not None:
+            qs = qs.filter(content_type__in=content_types)
+        rows = qs.order_by().values('content_type_id').annotate(
+            total_rating=Sum('rating_sum'), total_weight=Sum('weight_sum'), average_weight=Avg('weight_sum'),
+        ).values_list('content_type_id', 'total_rating', 'total_weight', 'average_weight')
+        priors = {}
+        for content_type_id, total_rating, total_weight, average_weight in rows:
+            mean = REVIEW_BAYESIAN_PRIOR_MEAN if REVIEW_BAYESIAN_PRIOR_MEAN is not None else total_rating / total_weight
+            weight = REVIEW_BAYESIAN_PRIOR_WEIGHT if REVIEW_BAYESIAN_PRIOR_WEIGHT is not None else average_weight
+            with transaction.atomic(using=self.db):
+                self.get_queryset().update_or_create(content_type_id=content_type_id,
+                                                     defaults={'mean': mean, 'weight': weight})
+                ReviewAggregate.objects.rescore(content_type_id, mean, weight)
+            priors[content_type_id] = (mean, weight)
+        return priors
@@ -0,0 +1,26 @@
+import logging
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from .request_cache import REQUEST_CACHE_ATTR, RequestCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewRequestCacheMiddleware(MiddlewareMixin):
+    """
+    Install cache of review lookups shared by review template tags rendered
+    for the request. In DEBUG mode number of database queries saved by the
+    cache is logged.
+    """
+
+    def process_request(self, request):
+        setattr(request, REQUEST_CACHE_ATTR, RequestCache())
+
+    def process_response(self, request, response):
+        cache = getattr(request, REQUEST_CACHE_ATTR, None)
+        if settings.DEBUG and cache is not None and cache.saved_queries:
+            logger.debug("Review tags saved %d queries rendering %s", cache.saved_queries, request.path)
+        return response
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+from reviews import DEFAULT_REVIEW_RATING_CHOICES
+
+
+def build_aggregates(apps, schema_editor):
+    # Reviews of custom REVIEW_APP model are counted by rebuild_review_statistics command
+    Review = apps.get_model('reviews', 'Review')
+    ReviewAggregate = apps.get_model('reviews', 'ReviewAggregate')
+    size = len(getattr(settings, 'REVIEW_RATING_CHOICES', DEFAULT_REVIEW_RATING_CHOICES))
+
+    aggregates = {}
+    rows = Review.objects.using(schema_editor.connection.alias).filter(is_public=True).order_by().values_list(
+        'content_type_id', 'object_pk', 'site_id', 'rating').annotate(Count('pk'), Sum('weight'))
+    for content_type_id, object_pk, site_id, rating, count, weight in rows:
+        aggregate = aggregates.get((content_type_id, object_pk, site_id))
+        if aggregate is None:
+            aggregate = ReviewAggregate(content_type_id=content_type_id, object_pk=object_pk, site_id=site_id,
+                                        histogram=[0] * size)
+            aggregates[(content_type_id, object_pk, site_id)] = aggregate
+        aggregate.review_count += count
+        aggregate.rating_sum += rating * weight
+        aggregate.weight_sum += weight
+        if 0 < rating <= size:
+            aggregate.histogram[rating - 1] = count
+
+    for aggregate in aggregates.values():
+        aggregate.histogram = ','.join(map(str, aggregate.histogram))
+    ReviewAggregate.objects.using(schema_editor.connection.alias).bulk_create(aggregates.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('sites', '0002_alter_domain_unique'),
+        ('reviews', '0002_review_model_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_pk', models.CharField(max_length=255, verbose_name='object ID')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='review count')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='weighted rating sum')),
+                ('weight_sum', models.PositiveIntegerField(default=0, verbose_name='weight sum')),
+                ('histogram', models.CharField(default='', max_length=255, verbose_name='histogram')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.ContentType', verbose_name='content type')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sites.Site')),
+            ],
+            options={
+                'verbose_name': 'review aggregate',
+                'verbose_name_plural': 'review aggregates',
+                'unique_together': {('content_type', 'object_pk', 'site')},
+            },
+        ),
+        migrations.RunPython(build_aggregates, migrations.RunPython.noop),
+    ]
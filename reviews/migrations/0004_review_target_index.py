@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+class AddTargetIndex(migrations.AddIndex):
+    """
+    MySQL can not index TEXT columns without prefix length, object_pk is
+    indexed by prefix there. Oracle can not index NCLOB columns at all, the
+    index is not created there.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'oracle':
+            return
+        if vendor != 'mysql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        column = lambda name: quote(model._meta.get_field(name).column)  # noqa: E731
+        schema_editor.execute('CREATE INDEX %s ON %s (%s, %s(191), %s, %s, %s DESC)' % (
+            quote(self.index.name), quote(model._meta.db_table), column('content_type'), column('object_pk'),
+            column('site'), column('is_public'), column('submit_date')
+        ))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'oracle':
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('sites', '0002_alter_domain_unique'),
+        ('reviews', '0003_reviewaggregate'),
+    ]
+
+    operations = [
+        AddTargetIndex(
+            model_name='review',
+            index=models.Index(fields=['content_type', 'object_pk', 'site', 'is_public', '-submit_date'],
+                               name='reviews_target_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('reviews', '0004_review_target_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_pk', models.CharField(max_length=255, verbose_name='review ID')),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'pending'), (1, 'processing'), (2, 'approved'), (3, 'flagged'), (4, 'failed')], default=0, verbose_name='status')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='started at')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='worker')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('reason', models.TextField(blank=True, verbose_name='reason')),
+                ('review_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.ContentType', verbose_name='review type')),
+            ],
+            options={
+                'verbose_name': 'moderation task',
+                'verbose_name_plural': 'moderation tasks',
+                'indexes': [models.Index(fields=['status', 'created'], name='reviews_moderation_queue_idx')],
+            },
+        ),
+    ]
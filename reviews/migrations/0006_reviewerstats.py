@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+def build_stats(apps, schema_editor):
+    # Reviews of custom REVIEW_APP model are counted by rebuild_review_statistics command
+    Review = apps.get_model('reviews', 'Review')
+    ReviewerStats = apps.get_model('reviews', 'ReviewerStats')
+    alias = schema_editor.connection.alias
+
+    rows = Review.objects.using(alias).filter(user__isnull=False).order_by().values('user_id').annotate(
+        count=Count('pk'), approved=Count('pk', filter=Q(is_public=True)), rating_sum=Sum('rating'),
+    ).values_list('user_id', 'count', 'approved', 'rating_sum')
+    ReviewerStats.objects.using(alias).bulk_create(
+        (ReviewerStats(user_id=user_id, review_count=count, approved_count=approved, rating_sum=rating_sum)
+         for user_id, count, approved, rating_sum in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reviews', '0005_moderationtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='review count')),
+                ('approved_count', models.PositiveIntegerField(default=0, verbose_name='approved review count')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='rating sum')),
+            ],
+            options={
+                'verbose_name': 'reviewer statistics',
+                'verbose_name_plural': 'reviewer statistics',
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
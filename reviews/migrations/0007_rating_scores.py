@@ -0,0 +1,70 @@
+from django.db import migrations, models
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Sqrt
+import django.db.models.deletion
+
+
+# Scores as defined when the migration was written: prior of the 5 default
+# rating choices with mean 3 and weight 1, Wilson score at 95% confidence.
+# Later rescoring is done by refresh_rating_priors command.
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 1.0
+WILSON_Z = 1.96
+RATING_CHOICES = 5
+
+
+def score_aggregates(apps, schema_editor):
+    ReviewAggregate = apps.get_model('reviews', 'ReviewAggregate')
+    rating_sum = Cast('rating_sum', FloatField())
+    weight_sum = Cast('weight_sum', FloatField())
+    count = Cast('review_count', FloatField())
+    z2 = Value(WILSON_Z * WILSON_Z, output_field=FloatField())
+    p = (rating_sum / weight_sum - 1.0) / float(RATING_CHOICES - 1)
+    ReviewAggregate.objects.using(schema_editor.connection.alias).filter(weight_sum__gt=0).update(
+        bayesian_average=(rating_sum + PRIOR_MEAN * PRIOR_WEIGHT) / (weight_sum + PRIOR_WEIGHT),
+        wilson_score=(p + z2 / (count * 2.0) - Sqrt((p * (1.0 - p) + z2 / (count * 4.0)) / count) * WILSON_Z)
+        / (z2 / count + 1.0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('reviews', '0006_reviewerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewaggregate',
+            name='bayesian_average',
+            field=models.FloatField(blank=True, null=True, verbose_name='Bayesian average rating'),
+        ),
+        migrations.AddField(
+            model_name='reviewaggregate',
+            name='wilson_score',
+            field=models.FloatField(blank=True, null=True, verbose_name='Wilson score'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewaggregate',
+            index=models.Index(fields=['content_type', 'site', '-bayesian_average'], name='reviews_aggregate_bayes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewaggregate',
+            index=models.Index(fields=['content_type', 'site', '-wilson_score'], name='reviews_aggregate_wilson_idx'),
+        ),
+        migrations.CreateModel(
+            name='RatingPrior',
+            fields=[
+                ('content_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='contenttypes.ContentType', verbose_name='content type')),
+                ('mean', models.FloatField(verbose_name='mean rating')),
+                ('weight', models.FloatField(verbose_name='weight')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'rating prior',
+                'verbose_name_plural': 'rating priors',
+            },
+        ),
+        migrations.RunPython(score_aggregates, migrations.RunPython.noop),
+    ]
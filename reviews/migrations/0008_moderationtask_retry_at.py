@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_rating_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationtask',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='retry at'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations, models
+
+
+class AddPublicTargetIndex(migrations.AddIndex):
+    """
+    MySQL supports neither partial indexes nor indexes on TEXT columns without
+    prefix length, index of all reviews with object_pk prefix is created there.
+    Oracle can not index NCLOB columns at all, the index is not created there.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'oracle':
+            return
+        if vendor != 'mysql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        column = lambda name: quote(model._meta.get_field(name).column)  # noqa: E731
+        schema_editor.execute('CREATE INDEX %s ON %s (%s, %s(191), %s, %s DESC)' % (
+            quote(self.index.name), quote(model._meta.db_table), column('content_type'), column('object_pk'),
+            column('site'), column('submit_date')
+        ))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'oracle':
+            return
+        if schema_editor.connection.vendor == 'mysql':
+            model = from_state.apps.get_model(app_label, self.model_name)
+            if self.allow_migrate_model(schema_editor.connection.alias, model):
+                schema_editor.execute('DROP INDEX %s ON %s' % (
+                    schema_editor.quote_name(self.index.name), schema_editor.quote_name(model._meta.db_table)))
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class RemoveTargetIndex(migrations.RemoveIndex):
+    """
+    Index was not created on Oracle.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'oracle':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'oracle':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_moderationtask_retry_at'),
+    ]
+
+    operations = [
+        AddPublicTargetIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(is_public=True),
+                               fields=['content_type', 'object_pk', 'site', '-submit_date'],
+                               name='reviews_public_target_idx'),
+        ),
+        RemoveTargetIndex(
+            model_name='review',
+            name='reviews_target_idx',
+        ),
+    ]
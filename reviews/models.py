@@ -5,13 +5,18 @@ from django.contrib.sites.models import Site
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
 
-from .managers import ReviewManager
+from . import signals, DEFAULT_REVIEW_RATING_CHOICES
+from .managers import (ReviewManager, ReviewAggregateManager, ModerationTaskManager, ReviewerStatsManager,
+                       RatingPriorManager)
+from .ratings import RatingSummary
 
 
 REVIEW_MAX_LENGTH = getattr(settings, 'REVIEW_MAX_LENGTH', 3000)
 REVIEW_PUBLISH_UNMODERATED = getattr(settings, 'REVIEW_PUBLISH_UNMODERATED', False)
+REVIEW_RATING_CHOICES = getattr(settings, 'REVIEW_RATING_CHOICES', DEFAULT_REVIEW_RATING_CHOICES)
 
 
 class BaseReviewAbstractModel(models.Model):
@@ -67,10 +72,47 @@ class UserReviewAbstractModel(BaseReviewAbstractModel):
     def __str__(self):
         return _("%(user)s review of %(object)s") % {'user': self.user, 'object': self.content_object}
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember reviewed object to refresh its statistics if review is moved to another one
+        if all(f in instance.__dict__ for f in ('content_type_id', 'object_pk', 'site_id')):
+            instance._loaded_target = instance.get_target_key()
+        # Remember contribution to user statistics to update them incrementally
+        if all(f in instance.__dict__ for f in ('user_id', 'is_public', 'rating')):
+            instance._loaded_stats = instance.get_stats_contribution()
+        return instance
+
+    def get_target_key(self):
+        """
+        Get (content_type_id, object_pk, site_id) tuple identifying reviewed object.
+        """
+        return self.content_type_id, force_str(self.object_pk), self.site_id
+
+    def get_stats_contribution(self):
+        """
+        Get (user_id, (reviews, approved reviews, rating sum)) contribution of
+        the review to statistics of its author.
+        """
+        return self.user_id, (1, int(bool(self.is_public)), int(self.rating))
+
     def save(self, *args, **kwargs):
         if self.submit_date is None:
             self.submit_date = timezone.now()
         super().save(*args, **kwargs)
+        old = getattr(self, '_loaded_stats', None)
+        new = self._loaded_stats = self.get_stats_contribution()
+        if old != new:
+            deltas = {new[0]: new[1]}
+            if old is not None:
+                delta = deltas.get(old[0], (0, 0, 0))
+                deltas[old[0]] = tuple(a - b for a, b in zip(delta, old[1]))
+            ReviewerStats.objects.apply(deltas)
+        targets = {self.get_target_key()}
+        if getattr(self, '_loaded_target', None) is not None:
+            targets.add(self._loaded_target)
+        self._loaded_target = self.get_target_key()
+        signals.send_target_changed(self.__class__, targets)
 
 
 class Review(UserReviewAbstractModel):
@@ -78,4 +120,180 @@ class Review(UserReviewAbstractModel):
     A user review for some object.
     """
     class Meta(UserReviewAbstractModel.Meta):
-        pass
+        indexes = [
+            # Matches review template tags query: filter by target object,
+            # order by submission date. Partial index of public reviews lets
+            # databases use it for boolean is_public filter and skip sorting.
+            models.Index(fields=['content_type', 'object_pk', 'site', '-submit_date'],
+                         name='reviews_public_target_idx', condition=models.Q(is_public=True)),
+        ]
+
+
+class ReviewAggregate(models.Model):
+    """
+    Denormalized rating statistics of public reviews for some object.
+    """
+    content_type = models.ForeignKey(ContentType,
+                                     verbose_name=_('content type'),
+                                     related_name="+",
+                                     on_delete=models.CASCADE)
+    object_pk = models.CharField(_('object ID'), max_length=255)
+    site = models.ForeignKey(Site, related_name="+", on_delete=models.CASCADE)
+    review_count = models.PositiveIntegerField(_('review count'), default=0)
+    rating_sum = models.PositiveIntegerField(_('weighted rating sum'), default=0)
+    weight_sum = models.PositiveIntegerField(_('weight sum'), default=0)
+    histogram = models.CharField(_('histogram'), max_length=255, default='')
+    bayesian_average = models.FloatField(_('Bayesian average rating'), blank=True, null=True)
+    wilson_score = models.FloatField(_('Wilson score'), blank=True, null=True)
+
+    objects = ReviewAggregateManager()
+
+    class Meta:
+        unique_together = ('content_type', 'object_pk', 'site')
+        indexes = [
+            # Top rated objects of some model
+            models.Index(fields=['content_type', 'site', '-bayesian_average'], name='reviews_aggregate_bayes_idx'),
+            models.Index(fields=['content_type', 'site', '-wilson_score'], name='reviews_aggregate_wilson_idx'),
+        ]
+        verbose_name = _('review aggregate')
+        verbose_name_plural = _('review aggregates')
+
+    @staticmethod
+    def histogram_size():
+        return len(REVIEW_RATING_CHOICES)
+
+    @property
+    def average_rating(self):
+        """
+        Weighted average rating: sum(rating * weight) / sum(weight).
+        """
+        if not self.weight_sum:
+            return None
+        return self.rating_sum / self.weight_sum
+
+    def get_histogram(self):
+        """
+        Get list of review counts for each rating choice.
+        """
+        histogram = [int(c) for c in self.histogram.split(',') if c]
+        size = self.histogram_size()
+        return (histogram + [0] * size)[:size]
+
+    def get_summary(self):
+        return RatingSummary(self.review_count, self.average_rating, self.get_histogram(),
+                             self.bayesian_average, self.wilson_score)
+
+
+class RatingPrior(models.Model):
+    """
+    Prior of Bayesian average rating for objects of some model: mean rating of
+    all its objects and weight (typical number of reviews of an object).
+    """
+    content_type = models.OneToOneField(ContentType,
+                                        verbose_name=_('content type'),
+                                        primary_key=True,
+                                        related_name="+",
+                                        on_delete=models.CASCADE)
+    mean = models.FloatField(_('mean rating'))
+    weight = models.FloatField(_('weight'))
+    updated = models.DateTimeField(_('updated at'), auto_now=True)
+
+    objects = RatingPriorManager()
+
+    class Meta:
+        verbose_name = _('rating prior')
+        verbose_name_plural = _('rating priors')
+
+
+class ReviewerStats(models.Model):
+    """
+    Denormalized statistics of reviews written by some user, maintained
+    incrementally and passed to get_review_user_weight.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                verbose_name=_('user'),
+                                primary_key=True,
+                                related_name="+",
+                                on_delete=models.CASCADE)
+    review_count = models.PositiveIntegerField(_('review count'), default=0)
+    approved_count = models.PositiveIntegerField(_('approved review count'), default=0)
+    rating_sum = models.PositiveIntegerField(_('rating sum'), default=0)
+
+    objects = ReviewerStatsManager()
+
+    class Meta:
+        verbose_name = _('reviewer statistics')
+        verbose_name_plural = _('reviewer statistics')
+
+    @property
+    def average_rating(self):
+        """
+        Average rating given by the user.
+        """
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+
+class ModerationTask(models.Model):
+    """
+    Review waiting in the moderation queue.
+    """
+    PENDING = 0
+    PROCESSING = 1
+    APPROVED = 2
+    FLAGGED = 3
+    FAILED = 4
+    STATUS_CHOICES = (
+        (PENDING, _('pending')),
+        (PROCESSING, _('processing')),
+        (APPROVED, _('approved')),
+        (FLAGGED, _('flagged')),
+        (FAILED, _('failed')),
+    )
+    # Untranslated status names used as keys of queue statistics
+    STATUS_NAMES = {
+        PENDING: 'pending',
+        PROCESSING: 'processing',
+        APPROVED: 'approved',
+        FLAGGED: 'flagged',
+        FAILED: 'failed',
+    }
+
+    review_type = models.ForeignKey(ContentType,
+                                    verbose_name=_('review type'),
+                                    related_name="+",
+                                    on_delete=models.CASCADE)
+    review_pk = models.CharField(_('review ID'), max_length=255)
+    review = GenericForeignKey(ct_field="review_type", fk_field="review_pk")
+    status = models.PositiveSmallIntegerField(_('status'), choices=STATUS_CHOICES, default=PENDING)
+    created = models.DateTimeField(_('created at'), default=timezone.now)
+    started = models.DateTimeField(_('started at'), blank=True, null=True)
+    finished = models.DateTimeField(_('finished at'), blank=True, null=True)
+    worker = models.CharField(_('worker'), max_length=100, blank=True)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    retry_at = models.DateTimeField(_('retry at'), blank=True, null=True)
+    reason = models.TextField(_('reason'), blank=True)
+
+    objects = ModerationTaskManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created'], name='reviews_moderation_queue_idx'),
+        ]
+        verbose_name = _('moderation task')
+        verbose_name_plural = _('moderation tasks')
+
+    def __str__(self):
+        return '%s %s: %s' % (self.review_type_id, self.review_pk, self.get_status_display())
+
+
+def review_deleted(sender, instance, **kwargs):
+    signals.send_target_changed(sender, {instance.get_target_key()})
+    user_id, contribution = getattr(instance, '_loaded_stats', None) or instance.get_stats_contribution()
+    ReviewerStats.objects.apply({user_id: tuple(-n for n in contribution)})
+
+
+def refresh_review_aggregates(sender, targets, **kwargs):
+    if issubclass(sender, UserReviewAbstractModel):
+        ReviewAggregate.objects.refresh(sender, targets)
@@ -0,0 +1,169 @@
+"""
+Moderation queue: posted reviews are put to the database backed queue and
+processed by ``moderate_reviews`` management command which runs pluggable
+checks and approves or flags reviews.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .profanity import find_profanities
+
+
+REVIEW_MODERATION_QUEUE = getattr(settings, 'REVIEW_MODERATION_QUEUE', False)
+REVIEW_MODERATION_CHECKS = getattr(settings, 'REVIEW_MODERATION_CHECKS', ['reviews.moderation.check_profanities'])
+REVIEW_MODERATION_AUTO_APPROVE = getattr(settings, 'REVIEW_MODERATION_AUTO_APPROVE', True)
+REVIEW_MODERATION_MAX_ATTEMPTS = getattr(settings, 'REVIEW_MODERATION_MAX_ATTEMPTS', 3)
+# Delay in seconds before the first retry of a failed task, doubled for every next attempt
+REVIEW_MODERATION_RETRY_DELAY = getattr(settings, 'REVIEW_MODERATION_RETRY_DELAY', 60)
+# Tasks processed longer than this number of seconds are claimed again
+REVIEW_MODERATION_TIMEOUT = getattr(settings, 'REVIEW_MODERATION_TIMEOUT', 600)
+
+_checks = None
+_checks_lock = threading.Lock()
+
+
+def check_profanities(review):
+    """
+    Flag reviews containing words from PROFANITIES_LIST.
+    """
+    bad_words = find_profanities(review.comment)
+    if bad_words:
+        return "Profanities: %s" % ', '.join(bad_words)
+    return None
+
+
+def get_checks():
+    """
+    Get moderation checks listed in REVIEW_MODERATION_CHECKS. Each check is a
+    callable accepting review and returning None if review passes the check
+    or a reason to flag it.
+    """
+    global _checks
+    with _checks_lock:
+        if _checks is None:
+            _checks = [import_string(path) for path in REVIEW_MODERATION_CHECKS]
+        return _checks
+
+
+def enqueue_review(sender, review, request, **kwargs):
+    """
+    Put posted review to the moderation queue, connected to review_was_posted
+    signal if REVIEW_MODERATION_QUEUE is enabled.
+    """
+    from .models import ModerationTask
+
+    if not getattr(review, 'is_public', False):
+        ModerationTask.objects.enqueue(review)
+
+
+def moderate(task):
+    """
+    Run checks for the review of the task, approve or flag it and save the task.
+    Failed task is retried later with exponential backoff. Attempts are counted
+    when tasks are claimed.
+    """
+    from .models import ModerationTask
+
+    try:
+        review = task.review
+        if review is None:
+            task.status, task.reason = ModerationTask.FAILED, "Review does not exist"
+        else:
+            reasons = [reason for reason in (check(review) for check in get_checks()) if reason]
+            if reasons:
+                task.status, task.reason = ModerationTask.FLAGGED, '\n'.join(reasons)
+            else:
+                task.status, task.reason = ModerationTask.APPROVED, ''
+                if REVIEW_MODERATION_AUTO_APPROVE and not review.is_public:
+                    review.is_public = True
+                    review.save()
+    except Exception as e:
+        retry = task.attempts < REVIEW_MODERATION_MAX_ATTEMPTS
+        task.status = ModerationTask.PENDING if retry else ModerationTask.FAILED
+        task.reason = '%s: %s' % (e.__class__.__name__, e)
+        if retry:
+            task.retry_at = timezone.now() + timedelta(
+                seconds=REVIEW_MODERATION_RETRY_DELAY * 2 ** max(task.attempts - 1, 0))
+    task.finished = timezone.now()
+    task.save(update_fields=['status', 'reason', 'finished', 'retry_at'])
+    return task.status
+
+
+def process_task(task_pk):
+    """
+    Moderate claimed task in a worker thread or process.
+    """
+    from .models import ModerationTask
+
+    try:
+        return moderate(ModerationTask.objects.get(pk=task_pk))
+    finally:
+        close_old_connections()
+
+
+def init_process():
+    import django
+
+    # Processes must not share connections inherited from parent
+    django.setup()
+    for connection in connections.all():
+        connection.close()
+
+
+def process_pending(batch_size=100, executor=None, worker=None):
+    """
+    Claim and moderate a batch of pending tasks using executor, or in current
+    thread if executor is not given. Returns number of processed tasks.
+    """
+    from .models import ModerationTask
+
+    worker = worker or '%s-%s' % (os.getpid(), uuid.uuid4().hex[:8])
+    tasks = ModerationTask.objects.claim(worker, batch_size, timeout=REVIEW_MODERATION_TIMEOUT,
+                                         max_attempts=REVIEW_MODERATION_MAX_ATTEMPTS)
+    if executor is None:
+        for task in tasks:
+            moderate(task)
+    else:
+        list(executor.map(process_task, [task.pk for task in tasks]))
+    return len(tasks)
+
+
+def run(workers=4, processes=False, batch_size=100, once=False, interval=5, report=None):
+    """
+    Process moderation queue with a pool of worker threads or processes until
+    the queue is empty (if once is set) or forever. Report is called after each
+    batch with throughput and queue statistics.
+    """
+    from .models import ModerationTask
+
+    if processes:
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    worker = '%s-%s' % (os.getpid(), uuid.uuid4().hex[:8])
+    processed = 0
+    start = time.monotonic()
+    with executor:
+        while True:
+            count = process_pending(batch_size, executor, worker)
+            processed += count
+            if count and report is not None:
+                elapsed = time.monotonic() - start
+                stats = ModerationTask.objects.stats()
+                stats.update(processed=processed, throughput=processed / elapsed if elapsed else 0)
+                report(stats)
+            if not count:
+                if once:
+                    break
+                time.sleep(interval)
+    return processed
@@ -0,0 +1,133 @@
+"""
+Profanity matcher: PROFANITIES_LIST is compiled once into a single regular
+expression built from a prefix trie of the words, so that a comment is scanned
+in one pass. The matcher is rebuilt when related settings change.
+"""
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+
+WORD_CHAR = re.compile(r'\w')
+PROFANITY_SETTINGS = {'PROFANITIES_LIST', 'REVIEW_PROFANITIES_WHOLE_WORDS', 'REVIEW_PROFANITIES_NORMALIZE'}
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def normalize(text):
+    """
+    Casefold text and strip diacritical marks and compatibility forms,
+    e.g. 'Ｒóoster' becomes 'rooster'.
+    """
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def trie_pattern(words):
+    """
+    Build regular expression pattern matching any of the words. Words sharing
+    a prefix share a branch of the pattern, so that each position of the text
+    is matched against the first character of all words at once.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+        if '' in node:
+            pattern = '(?:%s)?' % pattern
+        return pattern
+
+    return build(trie)
+
+
+class ProfanityMatcher:
+    """
+    Finds words of the list in a text. By default words are matched as
+    lowercase substrings of the text, whole_words restricts matches to word
+    boundaries and normalize ignores case, accents and compatibility forms.
+    """
+
+    def __init__(self, words, whole_words=False, normalize=False):
+        self.whole_words = whole_words
+        self.normalize = normalize
+        self.words = {}
+        for word in words:
+            self.words.setdefault(self.prepare(word), word)
+        self.words.pop('', None)
+        # Position of each word in the source list, found words are reported in this order
+        self.order = {prepared: index for index, prepared in enumerate(self.words)}
+        self.regex = None
+        if self.words:
+            pattern = trie_pattern(self.words)
+            if whole_words:
+                pattern = r'(?<!\w)%s(?!\w)' % pattern
+            # Lookahead matches at every position of the text, so that overlapping words are found in one pass
+            self.regex = re.compile('(?=(%s))' % pattern)
+
+    def prepare(self, text):
+        return normalize(text) if self.normalize else text.lower()
+
+    def find(self, text):
+        """
+        Get list of words found in the text, in the order of the source list.
+        """
+        if self.regex is None:
+            return []
+        text = self.prepare(text)
+        found = set()
+        seen = set()
+        for match in self.regex.finditer(text):
+            # The longest word starting at the position is matched, shorter
+            # words starting there are its prefixes
+            longest = match.group(1)
+            if longest in seen:
+                continue
+            seen.add(longest)
+            for length in range(1, len(longest) + 1):
+                prefix = longest[:length]
+                if prefix in self.order and (length == len(longest) or not self.whole_words or
+                                             not WORD_CHAR.match(longest[length])):
+                    found.add(prefix)
+        return [self.words[prepared] for prepared in sorted(found, key=self.order.__getitem__)]
+
+
+def get_matcher():
+    """
+    Get matcher compiled from PROFANITIES_LIST. It is also rebuilt if the list
+    is replaced in settings directly.
+    """
+    global _matcher
+    words = getattr(settings, 'PROFANITIES_LIST', ())
+    with _matcher_lock:
+        if _matcher is None or _matcher[0] is not words:
+            _matcher = (words, ProfanityMatcher(
+                words,
+                whole_words=getattr(settings, 'REVIEW_PROFANITIES_WHOLE_WORDS', False),
+                normalize=getattr(settings, 'REVIEW_PROFANITIES_NORMALIZE', False)))
+        return _matcher[1]
+
+
+def find_profanities(text):
+    return get_matcher().find(text)
+
+
+def profanity_settings_changed(setting, **kwargs):
+    global _matcher
+    if setting in PROFANITY_SETTINGS:
+        with _matcher_lock:
+            _matcher = None
+
+
+setting_changed.connect(profanity_settings_changed)
@@ -0,0 +1,283 @@
+import math
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Sum, F, Q, CharField, FloatField, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Sqrt
+
+from . import DEFAULT_REVIEW_RATING_CHOICES
+
+
+SHOW_RATING_TEXT = getattr(settings, 'REVIEW_SHOW_RATING_TEXT', True)
+REVIEW_RATING_CHOICES = getattr(settings, 'REVIEW_RATING_CHOICES', DEFAULT_REVIEW_RATING_CHOICES)
+# Prior of Bayesian average, mean and weight are calculated per content type if not set
+REVIEW_BAYESIAN_PRIOR_MEAN = getattr(settings, 'REVIEW_BAYESIAN_PRIOR_MEAN', None)
+REVIEW_BAYESIAN_PRIOR_WEIGHT = getattr(settings, 'REVIEW_BAYESIAN_PRIOR_WEIGHT', None)
+# Normal distribution quantile of Wilson score interval, 1.96 for 95% confidence
+REVIEW_WILSON_Z = getattr(settings, 'REVIEW_WILSON_Z', 1.96)
+
+# Rating value contexts for values quantized to 0.1, keyed by value * 10
+_rating_values = {}
+
+
+def get_rating_context(value):
+    """
+    Calculate ``reviews/rating_value.html`` template context for the rating value.
+    """
+    context_dict = {
+        'rating_choices': REVIEW_RATING_CHOICES,
+        'show_rating_text': SHOW_RATING_TEXT,
+        'rating': '{0:.1f}'.format(value)
+    }
+    if value < 1:
+        # This should not happen but we should correctly process it
+        context_dict['rating_text'] = REVIEW_RATING_CHOICES[0][1]
+    else:
+        context_dict['rating_text'] = REVIEW_RATING_CHOICES[int(round(value)) - 1][1]
+    if value < 0.3:
+        # Distinguish reviewed and unreviewed items
+        context_dict['rating_star'] = 's05'
+    else:
+        context_dict['rating_star'] = 's{0:02.0f}'.format(round(value * 2.0) * 5.0)
+    return context_dict
+
+
+def build_rating_values():
+    """
+    Precompute rating value contexts for all ratings quantized to 0.1.
+    """
+    _rating_values.clear()
+    for key in range(len(REVIEW_RATING_CHOICES) * 10 + 1):
+        _rating_values[key] = get_rating_context(key / 10)
+
+
+def rating_value_context(value):
+    """
+    Get ``reviews/rating_value.html`` template context for the rating value
+    quantized to 0.1, as it is displayed.
+    """
+    context_dict = _rating_values.get(int(round(value * 10)))
+    if context_dict is None:
+        return get_rating_context(value)
+    # Template tags can modify context, do not spoil precomputed one
+    return dict(context_dict)
+
+
+def default_prior():
+    """
+    Get (mean, weight) prior used when prior of content type was not calculated yet.
+    """
+    mean = REVIEW_BAYESIAN_PRIOR_MEAN
+    if mean is None:
+        mean = (1 + len(REVIEW_RATING_CHOICES)) / 2
+    return mean, REVIEW_BAYESIAN_PRIOR_WEIGHT if REVIEW_BAYESIAN_PRIOR_WEIGHT is not None else 1
+
+
+def bayesian_average(rating_sum, weight_sum, prior_mean, prior_weight):
+    """
+    Weighted average rating pulled towards prior mean, objects with few reviews
+    get ratings close to the prior.
+    """
+    if not weight_sum:
+        return None
+    return (prior_mean * prior_weight + rating_sum) / (prior_weight + weight_sum)
+
+
+def wilson_score(average, count, z=REVIEW_WILSON_Z):
+    """
+    Lower bound of Wilson score confidence interval for average rating scaled
+    to [0, 1] as a fraction of positive votes.
+    """
+    if not count or average is None:
+        return None
+    p = min(max((average - 1) / (len(REVIEW_RATING_CHOICES) - 1), 0), 1)
+    z2 = z * z
+    return (p + z2 / (2 * count) - z * math.sqrt((p * (1 - p) + z2 / (4 * count)) / count)) / (1 + z2 / count)
+
+
+def score_expressions(prior_mean, prior_weight, z=REVIEW_WILSON_Z):
+    """
+    Get {field: expression} mapping to update bayesian_average and wilson_score
+    of review aggregates with single UPDATE, same as bayesian_average() and
+    wilson_score(). Aggregates should have non-zero weight_sum.
+    """
+    rating_sum = Cast('rating_sum', FloatField())
+    weight_sum = Cast('weight_sum', FloatField())
+    count = Cast('review_count', FloatField())
+    z2 = Value(float(z * z), output_field=FloatField())
+    p = (rating_sum / weight_sum - 1.0) / float(len(REVIEW_RATING_CHOICES) - 1)
+    return {
+        'bayesian_average': (rating_sum + float(prior_mean * prior_weight)) / (weight_sum + float(prior_weight)),
+        'wilson_score': (p + z2 / (count * 2.0) - Sqrt((p * (1.0 - p) + z2 / (count * 4.0)) / count) * float(z))
+        / (z2 / count + 1.0),
+    }
+
+
+class RatingSummary:
+    """
+    Review count, weighted average rating and histogram of review counts per
+    rating choice for some object, with confidence adjusted ratings. Bayesian
+    average can be given as a function, it is called on first access.
+    """
+
+    def __init__(self, count=0, average=None, histogram=None, bayesian_average=None, wilson_score=None):
+        self.count = count
+        self.average = average
+        self.histogram = histogram if histogram is not None else [0] * len(REVIEW_RATING_CHOICES)
+        self.bayesian_average = bayesian_average
+        self.wilson_score = wilson_score
+
+    @property
+    def bayesian_average(self):
+        if callable(self._bayesian_average):
+            self._bayesian_average = self._bayesian_average()
+        return self._bayesian_average
+
+    @bayesian_average.setter
+    def bayesian_average(self, value):
+        self._bayesian_average = value
+
+    @property
+    def distribution(self):
+        """
+        List of (rating, rating text, review count) tuples for every rating choice.
+        """
+        return [(value, text, count) for (value, text), count in zip(REVIEW_RATING_CHOICES, self.histogram)]
+
+    def __repr__(self):
+        return '<RatingSummary: count=%r average=%r histogram=%r>' % (self.count, self.average, self.histogram)
+
+
+def get_summary_aggregates():
+    aggregates = {
+        'count': Count('pk'),
+        'rating_sum': Sum(F('rating') * F('weight')),
+        'weight_sum': Sum('weight'),
+        # Equal bounds mean reviews of single content type, its prior is used
+        'content_type_min': Min('content_type'),
+        'content_type_max': Max('content_type'),
+    }
+    for rating in range(1, len(REVIEW_RATING_CHOICES) + 1):
+        aggregates['rating_%d' % rating] = Count('pk', filter=Q(rating=rating))
+    return aggregates
+
+
+def get_prior(content_type_ids):
+    """
+    Get (mean, weight) prior of Bayesian average for reviews of the content
+    types, RatingPrior of the content type if there is single one, otherwise
+    default prior.
+    """
+    content_type_ids = set(content_type_ids)
+    if len(content_type_ids) != 1:
+        return default_prior()
+    from .models import RatingPrior
+
+    return RatingPrior.objects.get_priors(content_type_ids).popitem()[1]
+
+
+def make_summary(result, prior=None, content_type_ids=()):
+    """
+    Make RatingSummary of aggregated result. If prior of Bayesian average is
+    not given, it is looked up for the content types when the average is used.
+    """
+    average = result['rating_sum'] / result['weight_sum'] if result['weight_sum'] else None
+    histogram = [result['rating_%d' % rating] for rating in range(1, len(REVIEW_RATING_CHOICES) + 1)]
+    bayesian = None
+    if result['weight_sum']:
+        def get_bayesian_average():
+            return bayesian_average(result['rating_sum'], result['weight_sum'],
+                                    *(prior if prior is not None else get_prior(content_type_ids)))
+        bayesian = get_bayesian_average() if prior is not None else get_bayesian_average
+    return RatingSummary(result['count'], average, histogram, bayesian, wilson_score(average, result['count']))
+
+
+def summarize_ratings(queryset, prior=None):
+    """
+    Calculate RatingSummary of reviews in the queryset with single query using
+    conditional aggregation. Bayesian average uses the given (mean, weight)
+    prior, by default RatingPrior of the content type like ReviewAggregate,
+    which is queried only if the average is used.
+    """
+    result = queryset.order_by().aggregate(**get_summary_aggregates())
+    return make_summary(result, prior, {result['content_type_min'], result['content_type_max']})
+
+
+def summarize_reviews(reviews, prior=None):
+    """
+    Calculate RatingSummary of already fetched reviews, same as summarize_ratings.
+    """
+    result = {
+        'count': len(reviews),
+        'rating_sum': sum(review.rating * review.weight for review in reviews),
+        'weight_sum': sum(review.weight for review in reviews),
+    }
+    for rating in range(1, len(REVIEW_RATING_CHOICES) + 1):
+        result['rating_%d' % rating] = 0
+    for review in reviews:
+        result['rating_%d' % review.rating] += 1
+    return make_summary(result, prior, {review.content_type_id for review in reviews})
+
+
+async def asummarize_ratings(queryset, prior=None):
+    """
+    Async version of summarize_ratings.
+    """
+    from asgiref.sync import sync_to_async
+
+    result = await queryset.order_by().aaggregate(**get_summary_aggregates())
+    # Prior can not be looked up lazily in async context
+    if prior is None and result['weight_sum']:
+        prior = await sync_to_async(get_prior)({result['content_type_min'], result['content_type_max']})
+    return make_summary(result, prior)
+
+
+def annotate_with_ratings(queryset, site=None):
+    """
+    Annotate QuerySet of reviewed objects with review_count and average_rating
+    (weighted) of their public reviews, with bayesian_average and wilson_score
+    if review model maintains aggregates. Ratings are read with subqueries from
+    aggregates table or calculated from reviews table, so that objects can be
+    filtered and ordered by them in single SQL statement::
+
+        annotate_with_ratings(Product.objects.all()).filter(average_rating__gte=4).order_by('-average_rating')
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from .registry import get_capabilities
+
+    capabilities = get_capabilities()
+    ctype = ContentType.objects.get_for_model(queryset.model)
+    if site is None:
+        site = getattr(settings, 'SITE_ID', None)
+    object_pk = Cast(OuterRef('pk'), CharField())
+
+    if capabilities.has_aggregates:
+        from .models import ReviewAggregate
+
+        aggregates = ReviewAggregate.objects.filter(content_type=ctype, site=site, object_pk=object_pk)
+
+        def column(name):
+            return Subquery(aggregates.values(name)[:1])
+
+        average = Subquery(aggregates.filter(weight_sum__gt=0).annotate(
+            value=Cast('rating_sum', FloatField()) / Cast('weight_sum', FloatField())).values('value')[:1])
+        return queryset.annotate(
+            review_count=Coalesce(column('review_count'), 0, output_field=IntegerField()),
+            average_rating=average,
+            bayesian_average=column('bayesian_average'),
+            wilson_score=column('wilson_score'),
+        )
+
+    reviews = capabilities.model._default_manager.filter(content_type=ctype, object_pk=object_pk)
+    if capabilities.has_is_public:
+        reviews = reviews.filter(is_public=True)
+    if capabilities.has_site:
+        reviews = reviews.filter(site=site)
+    reviews = reviews.order_by().values('object_pk')
+    count = reviews.annotate(value=Count('pk')).values('value')
+    average = reviews.annotate(
+        value=Cast(Sum(F('rating') * F('weight')), FloatField()) / Cast(NullIf(Sum('weight'), 0), FloatField())
+    ).values('value')
+    return queryset.annotate(
+        review_count=Coalesce(Subquery(count, output_field=IntegerField()), 0),
+        average_rating=Subquery(average, output_field=FloatField()),
+    )
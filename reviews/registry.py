@@ -0,0 +1,37 @@
+from . import get_review_model, get_review_form
+
+
+class ReviewModelCapabilities:
+    """
+    Review model and form resolved for the review app together with optional
+    review model features used by views and template tags.
+    """
+
+    def __init__(self, model, form):
+        from .models import UserReviewAbstractModel
+
+        self.model = model
+        self.form = form
+        field_names = {f.name for f in model._meta.fields}
+        self.has_user = 'user' in field_names
+        self.has_is_public = 'is_public' in field_names
+        self.has_site = 'site' in field_names
+        # Only models derived from UserReviewAbstractModel maintain rating aggregates
+        self.has_aggregates = issubclass(model, UserReviewAbstractModel)
+
+
+# Capabilities keyed by (model, form), these are memoized and reset with
+# review app settings by get_review_model() and get_review_form()
+_capabilities = {}
+
+
+def get_capabilities():
+    """
+    Get capabilities of the current review model and form, they are calculated
+    once per model and form.
+    """
+    key = (get_review_model(), get_review_form())
+    capabilities = _capabilities.get(key)
+    if capabilities is None:
+        capabilities = _capabilities[key] = ReviewModelCapabilities(*key)
+    return capabilities
@@ -0,0 +1,119 @@
+"""
+Request scoped cache of review lookups, shared by review template tags
+rendered for the same request so that e.g. ``{% get_review_by_user %}`` and
+``{% render_review_form %}`` for one object hit the database once. Review
+lists are shared as QuerySets, once a list is evaluated counts and ratings of
+the same target are calculated from its rows.
+
+Cached lookups assume that reviews do not change while the request is
+rendered: views that save a review call clear_request_cache(), other code
+saving reviews during a request should do the same.
+"""
+from django.utils.encoding import smart_str
+
+
+REQUEST_CACHE_ATTR = '_review_cache'
+
+
+class RequestCache(dict):
+    """
+    Dictionary of cached lookups counting database queries it saved.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.saved_queries = 0
+
+
+def get_request_cache(request):
+    """
+    Get cache of the request or None if there is no request. The cache is
+    installed by ReviewRequestCacheMiddleware or on first use.
+    """
+    if request is None:
+        return None
+    cache = getattr(request, REQUEST_CACHE_ATTR, None)
+    if cache is None:
+        cache = RequestCache()
+        setattr(request, REQUEST_CACHE_ATTR, cache)
+    return cache
+
+
+def clear_request_cache(request):
+    """
+    Forget cached lookups, e.g. after a review of the request was saved.
+    """
+    if request is not None and hasattr(request, REQUEST_CACHE_ATTR):
+        getattr(request, REQUEST_CACHE_ATTR).clear()
+
+
+def cached(request, key, lookup):
+    """
+    Get value cached under the key for the request, call lookup() to get it
+    on first access. Lookups are not cached without request. Values are not
+    invalidated when reviews are saved, e.g. cached aggregates and counts stay
+    the same until clear_request_cache() is called.
+    """
+    cache = get_request_cache(request)
+    if cache is None:
+        return lookup()
+    if key in cache:
+        cache.saved_queries += 1
+    else:
+        cache[key] = lookup()
+    return cache[key]
+
+
+def get_reviews(request, target, lookup):
+    """
+    Get QuerySet of reviews of the (content type id, object pk, site id,
+    public only) target shared by tags of the request.
+    """
+    cache = get_request_cache(request)
+    if cache is None:
+        return lookup()
+    key = ('reviews',) + tuple(target)
+    queryset = cache.get(key)
+    if queryset is None:
+        queryset = cache[key] = lookup()
+    elif is_evaluated(queryset):
+        cache.saved_queries += 1
+    return queryset
+
+
+def get_evaluated_reviews(request, target):
+    """
+    Get list of reviews of the target if its shared QuerySet was already
+    evaluated, otherwise None.
+    """
+    cache = get_request_cache(request)
+    queryset = cache.get(('reviews',) + tuple(target)) if cache is not None else None
+    if queryset is None or not is_evaluated(queryset):
+        return None
+    cache.saved_queries += 1
+    return list(queryset)
+
+
+def is_evaluated(queryset):
+    """
+    Check if the QuerySet fetched its rows. Django has no public API for it,
+    so private result cache of the QuerySet is inspected.
+    """
+    return queryset._result_cache is not None
+
+
+def get_target(request, ctype, object_pk):
+    """
+    Get the reviewed object of the content type.
+    """
+    return cached(request, ('target', ctype.pk, smart_str(object_pk)),
+                  lambda: ctype.get_object_for_this_type(pk=object_pk))
+
+
+def get_user_review(request, queryset, ctype, object_pk, site_id, user):
+    """
+    Get review of the user for the (content type, object, site) target from
+    the queryset or None if the user did not review it.
+    """
+    return cached(request, ('user_review', ctype.pk, smart_str(object_pk), site_id, user.pk),
+                  lambda: queryset.filter(user=user).first())
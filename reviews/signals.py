@@ -1,3 +1,6 @@
+import threading
+from contextlib import contextmanager
+
 from django.dispatch import Signal
 
 # Sent just after a review was posted. This signal is sent at more or less
@@ -6,3 +9,53 @@ from django.dispatch import Signal
 
 # providing_args=["review", "request"]
 review_was_posted = Signal()
+
+# Sent after reviews of some objects were created, changed or deleted. Targets
+# is a set of (content_type_id, object_pk, site_id) tuples identifying objects
+# whose rating statistics should be recalculated.
+
+# providing_args=["targets"]
+review_target_changed = Signal()
+
+# Sent once after all reviews of a QuerySet were approved, rejected or deleted
+# by bulk moderation, it is not sent if moderation of some batch failed.
+# Reviews is a list of primary keys of affected reviews, action is one of
+# "approve", "reject" or "delete", request is an HTTP request if moderation was
+# performed in admin.
+
+# providing_args=["reviews", "action", "request"]
+reviews_moderated = Signal()
+
+_batch = threading.local()
+
+
+def send_target_changed(sender, targets):
+    """
+    Send review_target_changed signal, or postpone it if called inside
+    batch_target_changes block.
+    """
+    batch = getattr(_batch, 'targets', None)
+    if batch is not None:
+        batch.setdefault(sender, set()).update(targets)
+    else:
+        review_target_changed.send(sender=sender, targets=targets)
+
+
+@contextmanager
+def batch_target_changes():
+    """
+    Collect targets changed inside the block and send single review_target_changed
+    signal per review model on exit.
+    """
+    if getattr(_batch, 'targets', None) is not None:
+        # Already collecting in outer block
+        yield
+        return
+    _batch.targets = {}
+    try:
+        yield
+    finally:
+        # Changes made before an exception are committed too, so they are sent anyway
+        batch, _batch.targets = _batch.targets, None
+        for sender, targets in batch.items():
+            review_target_changed.send(sender=sender, targets=targets)
@@ -0,0 +1,56 @@
+"""
+Cache of templates selected for content types. Review tags and views look
+up ``reviews/<app>/<model>/<name>.html``, ``reviews/<app>/<name>.html`` and
+``reviews/<name>.html`` templates, selected template is remembered for the
+content type so that the loaders are not searched again even without cached
+template loader. The cache is cleared when TEMPLATES setting changes and when
+autoreloader of the development server detects changed file.
+"""
+from django.core.signals import setting_changed
+from django.template import loader
+from django.utils.autoreload import file_changed
+
+
+_templates = {}
+
+
+def get_search_list(name, app_label, model):
+    return [
+        "reviews/%s/%s/%s.html" % (app_label, model, name),
+        "reviews/%s/%s.html" % (app_label, name),
+        "reviews/%s.html" % name,
+    ]
+
+
+def select_template(name, app_label, model, engine=None):
+    """
+    Get template of the name for the model. Template is selected by the Engine
+    if it is given (to render with Context), otherwise by template backends.
+    """
+    key = (engine, name, app_label, model)
+    template = _templates.get(key)
+    if template is None:
+        search_list = get_search_list(name, app_label, model)
+        if engine is not None:
+            template = engine.select_template(search_list)
+        else:
+            template = loader.select_template(search_list)
+        _templates[key] = template
+    return template
+
+
+def clear():
+    _templates.clear()
+
+
+def templates_changed(setting, **kwargs):
+    if setting == 'TEMPLATES':
+        clear()
+
+
+def template_file_changed(file_path, **kwargs):
+    clear()
+
+
+setting_changed.connect(templates_changed)
+file_changed.connect(template_file_changed)
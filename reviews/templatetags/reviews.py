@@ -1,18 +1,23 @@
 from django import template
-from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.shortcuts import get_current_site
-from django.db.models import Sum, F, FloatField
-from django.db.models.functions import Cast
 from django.forms.models import model_to_dict
+from django.utils import timezone
 from django.utils.encoding import smart_str
 
-from .. import get_review_model, get_review_form as get_form, get_review_form_target, DEFAULT_REVIEW_RATING_CHOICES
+from .. import get_review_form_target, request_cache, template_cache, DEFAULT_REVIEW_RATING_CHOICES
+from ..cache import get_fragment
+from ..managers import REVIEW_LIST_PAGE_SIZE
+from ..models import ReviewAggregate
+from ..ratings import RatingSummary, rating_value_context, summarize_ratings, summarize_reviews
+from ..registry import get_capabilities
 
 
 SHOW_RATING_TEXT = getattr(settings, 'REVIEW_SHOW_RATING_TEXT', True)
 REVIEW_RATING_CHOICES = getattr(settings, 'REVIEW_RATING_CHOICES', DEFAULT_REVIEW_RATING_CHOICES)
+# Context variable holding ratings prefetched by get_ratings_for tag
+PREFETCHED_RATINGS = '_review_ratings'
 
 
 register = template.Library()
@@ -25,10 +30,15 @@ class BaseReviewNode(template.Node):
     obvious.
     """
 
+    # Optional trailing "name value" arguments accepted by the tag
+    options = ()
+    # Optional trailing flag arguments accepted by the tag
+    flags = ()
+
     @classmethod
     def handle_token(cls, parser, token):
         """Class method to parse get_review_list/count/form and return a Node."""
-        tokens = token.split_contents()
+        tokens, options = cls.parse_options(parser, token.split_contents())
         if tokens[1] != 'for':
             raise template.TemplateSyntaxError("Second argument in %r tag must be 'for'" % tokens[0])
 
@@ -39,6 +49,7 @@ class BaseReviewNode(template.Node):
             return cls(
                 object_expr=parser.compile_filter(tokens[2]),
                 as_varname=tokens[4],
+                **options
             )
 
         # {% get_whatever for app.model pk as varname %}
@@ -48,12 +59,32 @@ class BaseReviewNode(template.Node):
             return cls(
                 ctype=BaseReviewNode.lookup_content_type(tokens[2], tokens[0]),
                 object_pk_expr=parser.compile_filter(tokens[3]),
-                as_varname=tokens[5]
+                as_varname=tokens[5],
+                **options
             )
 
         else:
             raise template.TemplateSyntaxError("%r tag requires 4 or 5 arguments" % tokens[0])
 
+    @classmethod
+    def parse_options(cls, parser, tokens):
+        """Split trailing options (e.g. "limit 10 page 2 lean") from tag tokens."""
+        options = {}
+        while len(tokens) > 3:
+            if tokens[-1] in cls.flags and tokens[-2] != 'as':
+                if tokens[-1] in options:
+                    raise template.TemplateSyntaxError("%r option is used twice in %r tag" % (tokens[-1], tokens[0]))
+                options[tokens[-1]] = True
+                tokens = tokens[:-1]
+            elif tokens[-2] in cls.options:
+                if tokens[-2] + '_expr' in options:
+                    raise template.TemplateSyntaxError("%r option is used twice in %r tag" % (tokens[-2], tokens[0]))
+                options[tokens[-2] + '_expr'] = parser.compile_filter(tokens[-1])
+                tokens = tokens[:-2]
+            else:
+                break
+        return tokens, options
+
     @staticmethod
     def lookup_content_type(token, tagname):
         try:
@@ -68,7 +99,6 @@ class BaseReviewNode(template.Node):
         if ctype is None and object_expr is None:
             raise template.TemplateSyntaxError(
                 "Review nodes must be given either a literal object or a ctype and object pk.")
-        self.review_model = get_review_model()
         self.as_varname = as_varname
         self.ctype = ctype
         self.object_pk_expr = object_pk_expr
@@ -76,6 +106,14 @@ class BaseReviewNode(template.Node):
         self.review = review
         self.filter_public = True
 
+    @property
+    def capabilities(self):
+        return get_capabilities()
+
+    @property
+    def review_model(self):
+        return self.capabilities.model
+
     def render(self, context):
         qs = self.get_queryset(context)
         context[self.as_varname] = self.get_context_value_from_queryset(context, qs)
@@ -86,12 +124,12 @@ class BaseReviewNode(template.Node):
         if not object_pk:
             return self.review_model.objects.none()
 
-        # Explicit SITE_ID takes precedence over request. This is also how
-        # get_current_site operates.
-        site_id = getattr(settings, "SITE_ID", None)
-        if not site_id and ('request' in context):
-            site_id = get_current_site(context['request']).pk
+        site_id = self.get_site_id(context)
+        # Tags rendered for the same target share the QuerySet and its results
+        return request_cache.get_reviews(context.get('request'), self.get_target_key(ctype, object_pk, site_id),
+                                         lambda: self.build_queryset(ctype, object_pk, site_id))
 
+    def build_queryset(self, ctype, object_pk, site_id):
         qs = self.review_model.objects.filter(
             content_type=ctype,
             object_pk=smart_str(object_pk),
@@ -102,13 +140,27 @@ class BaseReviewNode(template.Node):
         # built-in review model's spam filtering system, so it might not
         # be present on a custom review model subclass. If it exists, we
         # should filter on it.
-        field_names = [f.name for f in self.review_model._meta.fields]
-        if self.filter_public and 'is_public' in field_names:
+        if self.filter_public and self.capabilities.has_is_public:
             qs = qs.filter(is_public=True)
-        if 'user' in field_names:
+        if self.capabilities.has_user:
             qs = qs.select_related('user')
         return qs
 
+    def get_target_key(self, ctype, object_pk, site_id):
+        """
+        Key of reviews listed by the node in the request cache.
+        """
+        return ctype.pk, smart_str(object_pk), site_id, self.filter_public and self.capabilities.has_is_public
+
+    @staticmethod
+    def get_site_id(context):
+        # Explicit SITE_ID takes precedence over request. This is also how
+        # get_current_site operates.
+        site_id = getattr(settings, "SITE_ID", None)
+        if not site_id and ('request' in context):
+            site_id = get_current_site(context['request']).pk
+        return site_id
+
     def get_target_ctype_pk(self, context):
         if self.object_expr:
             try:
@@ -119,15 +171,73 @@ class BaseReviewNode(template.Node):
         else:
             return self.ctype, self.object_pk_expr.resolve(context, ignore_failures=True)
 
+    def get_user_review(self, context, ctype, object_pk):
+        """
+        Get review of the request user for the target, shared by tags rendered
+        for the same request. Returns None for anonymous user.
+        """
+        request = context['request']
+        if not request.user.is_authenticated:
+            return None
+        site_id = self.get_site_id(context)
+        qs = self.review_model.objects.filter(
+            content_type=ctype,
+            object_pk=smart_str(object_pk),
+            site__pk=site_id,
+        ).select_related('user')
+        return request_cache.get_user_review(request, qs, ctype, object_pk, site_id, request.user)
+
     def get_context_value_from_queryset(self, context, qs):
         """Subclasses should override this."""
         raise NotImplementedError
 
+    def get_template(self, context, name, ctype):
+        """
+        Get ``reviews/<app>/<model>/<name>.html`` template of the content type,
+        falling back to ``reviews/<app>/<name>.html`` and ``reviews/<name>.html``.
+        """
+        return template_cache.select_template(name, ctype.app_label, ctype.model, engine=context.template.engine)
+
+    def render_template(self, context, name, ctype, **values):
+        """
+        Render template of the content type with values pushed to the context.
+        """
+        template = self.get_template(context, name, ctype)
+        with context.push(**values):
+            return template.render(context)
+
 
 class ReviewListNode(BaseReviewNode):
     """Insert a list of reviews into the context."""
+    options = ('limit', 'page')
+    flags = ('lean',)
+
+    def __init__(self, *args, limit_expr=None, page_expr=None, lean=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit_expr = limit_expr
+        self.page_expr = page_expr
+        self.lean = lean
+
+    @staticmethod
+    def resolve_number(expr, context):
+        if expr is None:
+            return None
+        try:
+            return max(int(expr.resolve(context)), 1)
+        except (template.VariableDoesNotExist, TypeError, ValueError):
+            return None
 
     def get_context_value_from_queryset(self, context, qs):
+        limit = self.resolve_number(self.limit_expr, context)
+        page = self.resolve_number(self.page_expr, context)
+        if page is not None and limit is None:
+            limit = REVIEW_LIST_PAGE_SIZE
+        if self.lean and not request_cache.is_evaluated(qs) and hasattr(qs, 'records'):
+            # Reviews already fetched for the request are used as they are
+            qs = qs.records()
+        if limit is not None:
+            offset = ((page or 1) - 1) * limit
+            qs = qs[offset:offset + limit]
         return qs
 
 
@@ -135,7 +245,12 @@ class ReviewCountNode(BaseReviewNode):
     """Insert a count of reviews into the context."""
 
     def get_context_value_from_queryset(self, context, qs):
-        return qs.count()
+        ctype, object_pk = self.get_target_ctype_pk(context)
+        if not object_pk or request_cache.is_evaluated(qs):
+            # Counted from already fetched reviews
+            return qs.count()
+        key = self.get_target_key(ctype, object_pk, self.get_site_id(context))
+        return request_cache.cached(context.get('request'), ('count',) + key, qs.count)
 
 
 class ReviewByUserNode(BaseReviewNode):
@@ -145,9 +260,11 @@ class ReviewByUserNode(BaseReviewNode):
         self.filter_public = False
 
     def get_context_value_from_queryset(self, context, qs):
-        field_names = [f.name for f in self.review_model._meta.fields]
-        if 'user' in field_names and ('request' in context) and context['request'].user:
-            return qs.filter(user=context['request'].user).first()
+        if self.capabilities.has_user and ('request' in context) and context['request'].user:
+            ctype, object_pk = self.get_target_ctype_pk(context)
+            if not object_pk:
+                return None
+            return self.get_user_review(context, ctype, object_pk)
         else:
             return self.review_model.objects.none()
 
@@ -155,38 +272,28 @@ class ReviewByUserNode(BaseReviewNode):
 class ReviewFormNode(BaseReviewNode):
     """Insert a form for the review model into the context."""
 
-    def get_form(self, context):
-        obj = self.get_object(context)
+    def get_form(self, context, ctype=None, object_pk=None):
+        obj = self.get_object(context, ctype, object_pk)
         if obj:
-            field_names = [f.name for f in self.review_model._meta.fields]
-            if 'user' in field_names and ('request' in context) and context['request'].user:
-                site_id = getattr(settings, "SITE_ID", None)
-                if not site_id and ('request' in context):
-                    site_id = get_current_site(context['request']).pk
-                try:
-                    content_type = ContentType.objects.get_for_model(obj)
-                    review = self.review_model.objects.get(
-                        content_type=content_type,
-                        object_pk=smart_str(obj.pk),
-                        site__pk=site_id,
-                        user=context['request'].user
-                    )
-                    return get_form()(obj, initial=model_to_dict(review))
-                except self.review_model.DoesNotExist:
-                    pass
-            return get_form()(obj)
+            form_class = self.capabilities.form
+            if self.capabilities.has_user and ('request' in context) and context['request'].user:
+                review = self.get_user_review(context, ctype or ContentType.objects.get_for_model(obj), obj.pk)
+                if review is not None:
+                    return form_class(obj, initial=model_to_dict(review))
+            return form_class(obj)
         else:
             return None
 
-    def get_object(self, context):
+    def get_object(self, context, ctype=None, object_pk=None):
         if self.object_expr:
             try:
                 return self.object_expr.resolve(context)
             except template.VariableDoesNotExist:
                 return None
         else:
-            object_pk = self.object_pk_expr.resolve(context, ignore_failures=True)
-            return self.ctype.get_object_for_this_type(pk=object_pk)
+            if object_pk is None:
+                ctype, object_pk = self.get_target_ctype_pk(context)
+            return request_cache.get_target(context.get('request'), ctype, object_pk)
 
     def render(self, context):
         context[self.as_varname] = self.get_form(context)
@@ -217,16 +324,9 @@ class RenderReviewFormNode(ReviewFormNode):
     def render(self, context):
         ctype, object_pk = self.get_target_ctype_pk(context)
         if object_pk:
-            template_search_list = [
-                "reviews/%s/%s/form.html" % (ctype.app_label, ctype.model),
-                "reviews/%s/form.html" % ctype.app_label,
-                "reviews/form.html"
-            ]
-            context_dict = context.flatten()
-            context_dict['form'] = self.get_form(context)
-            context_dict['show_rating_text'] = SHOW_RATING_TEXT
-            formstr = render_to_string(template_search_list, context_dict)
-            return formstr
+            return self.render_template(context, 'form', ctype,
+                                        form=self.get_form(context, ctype, object_pk),
+                                        show_rating_text=SHOW_RATING_TEXT)
         else:
             return ''
 
@@ -237,46 +337,94 @@ class RenderReviewListNode(ReviewListNode):
     @classmethod
     def handle_token(cls, parser, token):
         """Class method to parse render_review_list and return a Node."""
-        tokens = token.split_contents()
+        tokens, options = cls.parse_options(parser, token.split_contents())
         if tokens[1] != 'for':
             raise template.TemplateSyntaxError("Second argument in %r tag must be 'for'" % tokens[0])
 
         # {% render_review_list for obj %}
         if len(tokens) == 3:
-            return cls(object_expr=parser.compile_filter(tokens[2]))
+            return cls(object_expr=parser.compile_filter(tokens[2]), **options)
 
         # {% render_review_list for app.models pk %}
         elif len(tokens) == 4:
             return cls(
                 ctype=BaseReviewNode.lookup_content_type(tokens[2], tokens[0]),
-                object_pk_expr=parser.compile_filter(tokens[3])
+                object_pk_expr=parser.compile_filter(tokens[3]),
+                **options
             )
 
     def render(self, context):
         ctype, object_pk = self.get_target_ctype_pk(context)
         if object_pk:
-            template_search_list = [
-                "reviews/%s/%s/list.html" % (ctype.app_label, ctype.model),
-                "reviews/%s/list.html" % ctype.app_label,
-                "reviews/list.html"
-            ]
-            qs = self.get_queryset(context)
-            context_dict = context.flatten()
-            context_dict['review_list'] = self.get_context_value_from_queryset(context, qs)
-            context_dict['rating_choices'] = REVIEW_RATING_CHOICES
-            liststr = render_to_string(template_search_list, context_dict)
-            return liststr
+            target = (ctype.pk, smart_str(object_pk), self.get_site_id(context))
+            limit = self.resolve_number(self.limit_expr, context)
+            page = self.resolve_number(self.page_expr, context)
+            # Lean records render the username and dates are rendered in the current time zone
+            return get_fragment('list', target, lambda: self.render_list(context, ctype), limit, page, self.lean,
+                                timezone.get_current_timezone_name())
         else:
             return ''
 
+    def render_list(self, context, ctype):
+        qs = self.get_queryset(context)
+        return self.render_template(context, 'list', ctype,
+                                    review_list=self.get_context_value_from_queryset(context, qs),
+                                    rating_choices=REVIEW_RATING_CHOICES)
+
 
 class RatingAverageNode(BaseReviewNode):
     """Insert a rating weighted average into the context."""
 
-    def get_context_value_from_queryset(self, context, qs):
-        # select sum(rating * weight) / sum(weight) as average_rating
-        return qs.aggregate(average_rating=Cast(Sum(F('rating') * F('weight')), FloatField()) /
-                            Cast(Sum(F('weight')), FloatField()))['average_rating']
+    def render(self, context):
+        context[self.as_varname] = self.get_rating(context)[1]
+        return ''
+
+    def get_rating(self, context):
+        """
+        Get (review count, weighted average rating) tuple for the target object.
+        """
+        ctype, object_pk = self.get_target_ctype_pk(context)
+        prefetched = context.get(PREFETCHED_RATINGS)
+        if object_pk and prefetched and (ctype.pk, smart_str(object_pk)) in prefetched:
+            return prefetched[(ctype.pk, smart_str(object_pk))]
+        if object_pk:
+            reviews = request_cache.get_evaluated_reviews(
+                context.get('request'), self.get_target_key(ctype, object_pk, self.get_site_id(context)))
+            if reviews is not None:
+                summary = summarize_reviews(reviews)
+                return summary.count, summary.average
+        summary = self.get_summary(context)
+        return summary.count, summary.average
+
+    def get_summary(self, context):
+        """
+        Get RatingSummary for the target object. Reads denormalized aggregate when
+        review model maintains it, otherwise calculates it with single query or
+        from reviews already fetched for the request.
+        """
+        ctype, object_pk = self.get_target_ctype_pk(context)
+        if not object_pk:
+            return RatingSummary()
+        request = context.get('request')
+        site_id = self.get_site_id(context)
+        key = self.get_target_key(ctype, object_pk, site_id)
+        if self.capabilities.has_aggregates:
+            # Bayesian average uses prior of the content type, so it is not calculated from reviews
+            aggregate = request_cache.cached(request, ('aggregate',) + key,
+                                             lambda: ReviewAggregate.objects.lookup(ctype, object_pk, site_id))
+            return aggregate.get_summary() if aggregate else RatingSummary()
+        reviews = request_cache.get_evaluated_reviews(request, key)
+        if reviews is not None:
+            return summarize_reviews(reviews)
+        return request_cache.cached(request, ('summary',) + key, lambda: summarize_ratings(self.get_queryset(context)))
+
+
+class RatingSummaryNode(RatingAverageNode):
+    """Insert a rating summary (count, weighted average and histogram) into the context."""
+
+    def render(self, context):
+        context[self.as_varname] = self.get_summary(context)
+        return ''
 
 
 class RenderRatingAverageNode(RatingAverageNode):
@@ -303,35 +451,64 @@ class RenderRatingAverageNode(RatingAverageNode):
     def render(self, context):
         ctype, object_pk = self.get_target_ctype_pk(context)
         if object_pk:
-            template_search_list = [
-                "reviews/%s/%s/rating_average.html" % (ctype.app_label, ctype.model),
-                "reviews/%s/rating_average.html" % ctype.app_label,
-                "reviews/rating_average.html"
-            ]
-            qs = self.get_queryset(context)
-            count = qs.count()
-            context_dict = context.flatten()
-            context_dict['rating_choices'] = REVIEW_RATING_CHOICES
-            context_dict['show_rating_text'] = SHOW_RATING_TEXT
-            context_dict['review_count'] = count
-            if count > 0:
-                average = self.get_context_value_from_queryset(context, qs)
-                context_dict['average_rating'] = '{0:.1f}'.format(average)
-                if average < 1:
-                    # This can not happen but we should correctly process it
-                    context_dict['average_rating_text'] = REVIEW_RATING_CHOICES[0][1]
-                else:
-                    context_dict['average_rating_text'] = REVIEW_RATING_CHOICES[round(average) - 1][1]
-                if average < 0.3:
-                    # Distinguish reviewed and unreviewed items
-                    context_dict['average_rating_star'] = 's05'
-                else:
-                    context_dict['average_rating_star'] = 's{0:02.0f}'.format(round(average * 2.0) * 5.0)
-            ratingstr = render_to_string(template_search_list, context_dict)
-            return ratingstr
+            target = (ctype.pk, smart_str(object_pk), self.get_site_id(context))
+            return get_fragment('rating', target, lambda: self.render_rating(context, ctype))
         else:
             return ''
 
+    def render_rating(self, context, ctype):
+        count, average = self.get_rating(context)
+        values = {
+            'rating_choices': REVIEW_RATING_CHOICES,
+            'show_rating_text': SHOW_RATING_TEXT,
+            'review_count': count,
+        }
+        if count > 0 and average is not None:
+            rating_context = rating_value_context(average)
+            values['average_rating'] = rating_context['rating']
+            values['average_rating_text'] = rating_context['rating_text']
+            values['average_rating_star'] = rating_context['rating_star']
+        return self.render_template(context, 'rating_average', ctype, **values)
+
+
+class RatingsForNode(template.Node):
+    """Insert ratings of a list of objects into the context and prefetch them for rating tags."""
+
+    @classmethod
+    def handle_token(cls, parser, token):
+        """Class method to parse get_ratings_for and return a Node."""
+        tokens = token.split_contents()
+        # {% get_ratings_for objects as varname %}
+        if len(tokens) != 4:
+            raise template.TemplateSyntaxError("%r tag requires 3 arguments" % tokens[0])
+        if tokens[2] != 'as':
+            raise template.TemplateSyntaxError("Second argument in %r must be 'as'" % tokens[0])
+        return cls(objects_expr=parser.compile_filter(tokens[1]), as_varname=tokens[3])
+
+    def __init__(self, objects_expr, as_varname):
+        self.objects_expr = objects_expr
+        self.as_varname = as_varname
+
+    def render(self, context):
+        try:
+            objects = list(self.objects_expr.resolve(context) or [])
+        except template.VariableDoesNotExist:
+            objects = []
+        site_id = BaseReviewNode.get_site_id(context)
+        capabilities = get_capabilities()
+        if capabilities.has_aggregates:
+            ratings = ReviewAggregate.objects.ratings_for(objects, site_id)
+        else:
+            ratings = capabilities.model.objects.ratings_for(objects, site_id)
+
+        prefetched = dict(context.get(PREFETCHED_RATINGS) or {})
+        if objects:
+            ctype = ContentType.objects.get_for_model(objects[0])
+            prefetched.update(((ctype.pk, smart_str(pk)), rating) for pk, rating in ratings.items())
+        context[PREFETCHED_RATINGS] = prefetched
+        context[self.as_varname] = ratings
+        return ''
+
 
 # We could just register each classmethod directly, but then we'd lose out on
 # the automagic docstrings-into-admin-docs tricks. So each node gets a cute
@@ -368,8 +545,8 @@ def get_review_list(parser, token):
 
     Syntax::
 
-        {% get_review_list for [object] as [varname]  %}
-        {% get_review_list for [app].[model] [object_id] as [varname]  %}
+        {% get_review_list for [object] as [varname] [limit [number]] [page [number]] [lean] %}
+        {% get_review_list for [app].[model] [object_id] as [varname] [limit [number]] [page [number]] [lean] %}
 
     Example usage::
 
@@ -378,6 +555,13 @@ def get_review_list(parser, token):
             ...
         {% endfor %}
 
+        {% get_review_list for product as review_list limit 10 page request.GET.page %}
+
+    With ``lean`` option the list contains lightweight ReviewRecord objects
+    with id, rating, weight, comment, submit_date and user only. The user is
+    the username rather than the user object, which renders differently if
+    str() of the user model is not the username.
+
     """
     return ReviewListNode.handle_token(parser, token)
 
@@ -390,12 +574,14 @@ def render_review_list(parser, token):
 
     Syntax::
 
-        {% render_review_list for [object] %}
-        {% render_review_list for [app].[model] [object_id] %}
+        {% render_review_list for [object] [limit [number]] [page [number]] [lean] %}
+        {% render_review_list for [app].[model] [object_id] [limit [number]] [page [number]] [lean] %}
 
     Example usage::
 
         {% render_review_list for product %}
+        {% render_review_list for product limit 10 %}
+        {% render_review_list for product limit 10 lean %}
 
     """
     return RenderReviewListNode.handle_token(parser, token)
@@ -497,6 +683,31 @@ def get_rating(parser, token):
     return RatingAverageNode.handle_token(parser, token)
 
 
+@register.tag
+def get_rating_summary(parser, token):
+    """
+    Gets the review count, average rating and histogram of review counts per
+    rating for the given params and populates the template context with a
+    variable containing that summary, whose name is defined by the 'as'
+    clause.
+
+    Syntax::
+
+        {% get_rating_summary for [object] as [varname]  %}
+        {% get_rating_summary for [app].[model] [object_id] as [varname]  %}
+
+    Example usage::
+
+        {% get_rating_summary for product as summary %}
+        {{ summary.count }} reviews, {{ summary.average|floatformat:1 }}
+        {% for rating, text, count in summary.distribution %}
+            {{ text }}: {{ count }}
+        {% endfor %}
+
+    """
+    return RatingSummaryNode.handle_token(parser, token)
+
+
 @register.tag
 def render_rating(parser, token):
     """
@@ -516,6 +727,30 @@ def render_rating(parser, token):
     return RenderRatingAverageNode.handle_token(parser, token)
 
 
+@register.tag
+def get_ratings_for(parser, token):
+    """
+    Gets review counts and average ratings for a list of objects of the same
+    model with single query and populates the template context with a
+    dictionary of {pk: (count, rating)}, whose name is defined by the 'as'
+    clause. Subsequent ``{% get_rating %}`` and ``{% render_rating %}`` tags
+    for these objects read prefetched values without hitting the database.
+
+    Syntax::
+
+        {% get_ratings_for [objects] as [varname] %}
+
+    Example usage::
+
+        {% get_ratings_for products as ratings %}
+        {% for product in products %}
+            {% render_rating for product %}
+        {% endfor %}
+
+    """
+    return RatingsForNode.handle_token(parser, token)
+
+
 @register.inclusion_tag('reviews/rating_value.html')
 def render_rating_value(value):
     """
@@ -530,19 +765,4 @@ def render_rating_value(value):
         {% render_rating_value review.rating %}
 
     """
-    context_dict = {
-        'rating_choices': REVIEW_RATING_CHOICES,
-        'show_rating_text': SHOW_RATING_TEXT,
-        'rating': '{0:.1f}'.format(value)
-    }
-    if value < 1:
-        # This should not happen but we should correctly process it
-        context_dict['rating_text'] = REVIEW_RATING_CHOICES[0][1]
-    else:
-        context_dict['rating_text'] = REVIEW_RATING_CHOICES[int(round(value)) - 1][1]
-    if value < 0.3:
-        # Distinguish reviewed and unreviewed items
-        context_dict['rating_star'] = 's05'
-    else:
-        context_dict['rating_star'] = 's{0:02.0f}'.format(round(value * 2.0) * 5.0)
-    return context_dict
+    return rating_value_context(value)
@@ -6,11 +6,12 @@ except ImportError:
 
 from django.contrib.contenttypes.views import shortcut
 
-from .views import post_review, review_done
+from .views import post_review, review_done, review_list
 
 
 urlpatterns = [
     re_path(r'^post/$', post_review, name='post-review'),
     re_path(r'^posted/$', review_done, name='review-done'),
+    re_path(r'^list/(\d+)/(.+)/$', review_list, name='review-list'),
     re_path(r'^rr/(\d+)/(.+)/$', shortcut, name='review-url-redirect'),
 ]
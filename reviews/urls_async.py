@@ -0,0 +1,13 @@
+from django.urls import re_path
+from django.contrib.contenttypes.views import shortcut
+
+from .views_async import apost_review, areview_done, areview_list
+
+
+# Async views for ASGI deployments, include instead of reviews.urls
+urlpatterns = [
+    re_path(r'^post/$', apost_review, name='post-review'),
+    re_path(r'^posted/$', areview_done, name='review-done'),
+    re_path(r'^list/(\d+)/(.+)/$', areview_list, name='review-list'),
+    re_path(r'^rr/(\d+)/(.+)/$', shortcut, name='review-url-redirect'),
+]
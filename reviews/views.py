@@ -14,12 +14,15 @@ except ImportError:
     # Django 1.11, 2.*
     from django.utils.http import is_safe_url as url_has_allowed_host_and_scheme
 from django.views.decorators.csrf import csrf_protect
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 
-from . import signals, get_review_model, get_review_form, get_review_user_weight
+from . import request_cache, signals, template_cache, get_review_user_weight
+from .managers import REVIEW_LIST_PAGE_SIZE
+from .registry import get_capabilities
 
 
 SHOW_RATING_TEXT = getattr(settings, 'REVIEW_SHOW_RATING_TEXT', True)
+REVIEW_LIST_MAX_PAGE_SIZE = getattr(settings, 'REVIEW_LIST_MAX_PAGE_SIZE', 100)
 
 
 class ReviewPostBadRequest(http.HttpResponseBadRequest):
@@ -63,7 +66,7 @@ def post_review(request, next=None, using=None):
         return ReviewPostBadRequest("Attempting to get content-type %r and object PK %r exists raised %s" % (escape(ctype), escape(object_pk), e.__class__.__name__))
 
     # Construct the review form
-    form = get_review_form()(target, data=data)
+    form = get_capabilities().form(target, data=data)
 
     # Check security information
     if form.security_errors():
@@ -71,19 +74,7 @@ def post_review(request, next=None, using=None):
 
     # If there are errors show the review
     if form.errors:
-        template_list = [
-            "reviews/%s/%s/post.html" % (model._meta.app_label, model._meta.model_name),
-            "reviews/%s/post.html" % model._meta.app_label,
-            "reviews/post.html",
-        ]
-        return render(request, template_list, {
-            "target": target,
-            "comment": form.data.get("comment", ""),
-            "rating": form.data.get("rating", ""),
-            "form": form,
-            "next": data.get("next", next),
-            "show_rating_text": SHOW_RATING_TEXT
-        })
+        return render_post_errors(request, model, target, form, data.get("next", next))
 
     # Get existing review
     if form.cleaned_data["id"] is not None:
@@ -105,11 +96,28 @@ def post_review(request, next=None, using=None):
 
     # Save the review and signal that it was saved
     review.save()
+    # Cached lookups of this request are stale now
+    request_cache.clear_request_cache(request)
     signals.review_was_posted.send(sender=review.__class__, review=review, request=request)
 
     return next_redirect(request, fallback=next or 'review-done', r=review._get_pk_val())
 
 
+def render_post_errors(request, model, target, form, next):
+    """
+    Show the review form with validation errors.
+    """
+    template = template_cache.select_template('post', model._meta.app_label, model._meta.model_name)
+    return http.HttpResponse(template.render({
+        "target": target,
+        "comment": form.data.get("comment", ""),
+        "rating": form.data.get("rating", ""),
+        "form": form,
+        "next": next,
+        "show_rating_text": SHOW_RATING_TEXT
+    }, request))
+
+
 def next_redirect(request, fallback, **get_kwargs):
     """
     Handle the "where should I go next?" part of comment views.
@@ -141,7 +149,72 @@ def review_done(request):
     template = "reviews/posted.html"
     if 'r' in request.GET:
         try:
-            review = get_review_model().objects.get(pk=request.GET['r'])
+            review = get_capabilities().model.objects.get(pk=request.GET['r'])
         except (ObjectDoesNotExist, ValueError):
             pass
     return render(request, template, {'review': review})
+
+
+def get_list_limit(request):
+    """
+    Get validated page size of review list request or None if it is invalid.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', REVIEW_LIST_PAGE_SIZE)), REVIEW_LIST_MAX_PAGE_SIZE)
+    except ValueError:
+        return None
+    return limit if limit > 0 else None
+
+
+def get_list_queryset(content_type_id, object_pk, site_id):
+    capabilities = get_capabilities()
+    qs = capabilities.model.objects.filter(
+        content_type_id=content_type_id,
+        object_pk=object_pk,
+        site__pk=site_id,
+    )
+    if capabilities.has_is_public:
+        qs = qs.filter(is_public=True)
+    if capabilities.has_user:
+        qs = qs.select_related('user')
+    return qs
+
+
+def review_list_response(qs, reviews, limit):
+    """
+    Build JSON response from page of reviews fetched with one extra review.
+    """
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        next_cursor = qs.get_cursor(reviews[-1])
+    return http.JsonResponse({
+        'reviews': [{
+            'id': review.pk,
+            'rating': review.rating,
+            'submit_date': review.submit_date.isoformat(),
+            'user': str(review.user) if getattr(review, 'user', None) else None,
+            'comment': review.comment,
+        } for review in reviews],
+        'next': next_cursor,
+    })
+
+
+@require_GET
+def review_list(request, content_type_id, object_pk):
+    """
+    Return a page of public reviews for the object as JSON. Pages are
+    requested with ``after`` cursor returned as ``next`` by the previous page
+    and optional ``limit`` argument.
+    """
+    limit = get_list_limit(request)
+    if limit is None:
+        return http.HttpResponseBadRequest("Invalid limit value")
+
+    qs = get_list_queryset(content_type_id, object_pk, get_current_site(request).pk)
+    try:
+        # Fetch one extra review to find out whether there is a next page
+        reviews = list(qs.seek(after=request.GET.get('after'), limit=limit + 1))
+    except ValueError:
+        return http.HttpResponseBadRequest("Invalid after value")
+    return review_list_response(qs, reviews, limit)
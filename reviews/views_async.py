@@ -0,0 +1,178 @@
+"""
+Native async versions of review views for ASGI deployments, requires Django 4.2+.
+Database queries are made with async ORM API, hooks and templates which may
+access database synchronously are run in a thread.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django import http
+from django.apps import apps
+from django.conf import settings
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.html import escape
+
+from . import request_cache, signals, get_review_app_function, get_review_user_weight
+from .managers import aget_content_type
+from .registry import get_capabilities
+from .views import (ReviewPostBadRequest, get_list_limit, get_list_queryset, next_redirect, render_post_errors,
+                    review_list_response)
+
+
+def csrf_protect_async(view):
+    """
+    Apply CsrfViewMiddleware to async view, csrf_protect decorator does not
+    support async views before Django 5.0.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        middleware = CsrfViewMiddleware(view)
+
+        def check():
+            return middleware.process_request(request) or middleware.process_view(request, view, args, kwargs)
+
+        if getattr(settings, 'CSRF_USE_SESSIONS', False):
+            # Token is stored in session which is loaded from database
+            response = await sync_to_async(check)()
+        else:
+            response = check()
+        if response is not None:
+            return response
+        response = await view(request, *args, **kwargs)
+        return middleware.process_response(request, response)
+    return wrapper
+
+
+async def aget_request_user(request):
+    """
+    Get user of the request, AuthenticationMiddleware sets it lazily and it is
+    loaded from database on first access.
+    """
+    if hasattr(request, 'auser'):
+        return await request.auser()
+    user = request.user
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        await sync_to_async(user._setup)()
+        user = user._wrapped
+    return user
+
+
+async def aget_site_id(request):
+    site_id = getattr(settings, 'SITE_ID', None)
+    if site_id is None:
+        site_id = (await sync_to_async(get_current_site)(request)).id
+    return site_id
+
+
+async def apost_review(request, next=None, using=None):
+    """
+    Async version of post_review view.
+    """
+    if request.method != 'POST':
+        return http.HttpResponseNotAllowed(['POST'])
+    return await _apost_review(request, next, using)
+
+
+@csrf_protect_async
+async def _apost_review(request, next=None, using=None):
+    data = request.POST.copy()
+
+    # Look up the object we're trying to comment about
+    ctype = data.get("content_type")
+    object_pk = data.get("object_pk")
+    if ctype is None or object_pk is None:
+        return ReviewPostBadRequest("Missing content_type or object_pk field.")
+    try:
+        model = apps.get_model(*ctype.split(".", 1))
+        target = await model._default_manager.using(using).aget(pk=object_pk)
+    except TypeError:
+        return ReviewPostBadRequest("Invalid content_type value: %r" % escape(ctype))
+    except AttributeError:
+        return ReviewPostBadRequest("The given content-type %r does not resolve to a valid model." % escape(ctype))
+    except ObjectDoesNotExist:
+        return ReviewPostBadRequest("No object matching content-type %r and object PK %r exists." % (escape(ctype), escape(object_pk)))
+    except (ValueError, ValidationError) as e:
+        return ReviewPostBadRequest("Attempting to get content-type %r and object PK %r exists raised %s" % (escape(ctype), escape(object_pk), e.__class__.__name__))
+
+    # Form looks up content type of the target, make sure it is cached
+    await aget_content_type(target)
+    form = get_capabilities().form(target, data=data)
+
+    # Check security information
+    if form.security_errors():
+        return ReviewPostBadRequest("The comment form failed security verification: %s" % escape(str(form.security_errors())))
+
+    user = await aget_request_user(request)
+    request.user = user
+
+    # If there are errors show the review
+    if form.errors:
+        return await sync_to_async(render_post_errors)(request, model, target, form, data.get("next", next))
+
+    # Get existing review
+    if form.cleaned_data["id"] is not None:
+        try:
+            review = await form.get_review_model().objects.select_related('content_type').aget(
+                pk=form.cleaned_data["id"])
+        except ObjectDoesNotExist:
+            return ReviewPostBadRequest("Referenced object gone")
+        if not user.is_authenticated or review.user_id != user.pk:
+            return ReviewPostBadRequest("User spoofing")
+        form.update_review_object(review)
+    else:
+        # Otherwise create the review
+        review = form.get_review_object(site_id=await aget_site_id(request))
+        if user.is_authenticated:
+            review.user = user
+
+    if get_review_app_function("get_review_user_weight") is None:
+        review.weight = get_review_user_weight(user, target)
+    else:
+        # Custom weight function may query database
+        review.weight = await sync_to_async(get_review_user_weight)(user, target)
+    review.ip_address = request.META.get("REMOTE_ADDR", None) or None
+
+    # Save the review and signal that it was saved
+    await review.asave()
+    # Cached lookups of this request are stale now
+    request_cache.clear_request_cache(request)
+    if signals.review_was_posted.has_listeners(review.__class__):
+        await sync_to_async(signals.review_was_posted.send)(sender=review.__class__, review=review, request=request)
+
+    return next_redirect(request, fallback=next or 'review-done', r=review._get_pk_val())
+
+
+async def areview_done(request):
+    """
+    Async version of review_done view.
+    """
+    review = None
+    if 'r' in request.GET:
+        try:
+            review = await get_capabilities().model.objects.aget(pk=request.GET['r'])
+        except (ObjectDoesNotExist, ValueError):
+            pass
+    return await sync_to_async(render)(request, "reviews/posted.html", {'review': review})
+
+
+async def areview_list(request, content_type_id, object_pk):
+    """
+    Async version of review_list view.
+    """
+    if request.method != 'GET':
+        return http.HttpResponseNotAllowed(['GET'])
+    limit = get_list_limit(request)
+    if limit is None:
+        return http.HttpResponseBadRequest("Invalid limit value")
+
+    qs = get_list_queryset(content_type_id, object_pk, await aget_site_id(request))
+    try:
+        # Fetch one extra review to find out whether there is a next page
+        reviews = await qs.aseek(after=request.GET.get('after'), limit=limit + 1)
+    except ValueError:
+        return http.HttpResponseBadRequest("Invalid after value")
+    return review_list_response(qs, reviews, limit)
@@ -29,6 +29,7 @@ setuptools.setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    install_requires=['Django>=1.11'],
+    python_requires='>=3.5',
+    install_requires=['Django>=2.2'],
     test_suite='tests.runtests.main'
 )
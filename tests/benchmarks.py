@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+"""
+Performance benchmarks for the reviews app. Benchmarks run against the test
+database configured in runtests.py.
+
+Usage::
+
+    python benchmarks.py              # run all benchmarks
+    python benchmarks.py target_index # run selected benchmarks
+"""
+
+import sys
+import time
+
+import django
+
+from runtests import settings  # noqa: F401 - configures settings
+
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def measure(func, number=100):
+    """Return average time of func call in milliseconds."""
+    func()
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) * 1000 / number
+
+
+def report(title, **values):
+    print('  %s: %s' % (title, ', '.join('%s=%s' % (k, v) for k, v in values.items())))
+
+
+def create_reviews(objects=200, per_object=100, model=None):
+    from django.contrib.auth.models import User
+    from django.contrib.contenttypes.models import ContentType
+    from django.utils import timezone
+    from reviews.models import Review
+    from testapp.models import Product
+
+    model = model or Product
+    ctype = ContentType.objects.get_for_model(model)
+    if not model.objects.exists():
+        model.objects.bulk_create(model(title='Product %d' % i, price=1) for i in range(objects))
+    user, _ = User.objects.get_or_create(username='benchmark')
+    now = timezone.now()
+    reviews = []
+    for obj in model.objects.all()[:objects]:
+        for i in range(per_object):
+            reviews.append(Review(content_type=ctype, object_pk=str(obj.pk), site_id=1, user=user,
+                                  rating=i % 5 + 1, comment='Review %d' % i, is_public=i % 3 != 0,
+                                  submit_date=now - timezone.timedelta(minutes=i)))
+    Review.objects.bulk_create(reviews, batch_size=1000)
+    return ctype
+
+
+@benchmark
+def target_index():
+    """Query plan and timing of template tag review query with and without target index."""
+    from django.db import connection
+    from reviews.models import Review
+
+    ctype = create_reviews()
+    qs = Review.objects.filter(content_type=ctype, object_pk='100', site__pk=1, is_public=True)
+    index = Review._meta.indexes[0]
+
+    def run():
+        list(qs.all())
+
+    for title in ('with index', 'without index'):
+        plan = qs.explain()
+        print('  %s plan: %s' % (title, plan.replace('\n', '; ')))
+        # Partial index of public reviews is ordered by submit_date, so rows need no sorting
+        report(title, ms=round(measure(run), 3), temp_sort='TEMP B-TREE' in plan)
+        if title == 'with index':
+            with connection.schema_editor() as editor:
+                editor.remove_index(Review, index)
+    with connection.schema_editor() as editor:
+        editor.add_index(Review, index)
+
+
+@benchmark
+def rating_value():
+    """Per-call cost of render_rating_value context computation and rendering."""
+    from django.template import Context, Template
+    from reviews.ratings import get_rating_context, rating_value_context
+
+    values = [1, 2, 3, 4, 5, 3.7, 4.25]
+    report('computed context', us=round(measure(lambda: [get_rating_context(v) for v in values], 10000)
+                                        * 1000 / len(values), 3))
+    report('precomputed context', us=round(measure(lambda: [rating_value_context(v) for v in values], 10000)
+                                           * 1000 / len(values), 3))
+    t = Template('{% load reviews %}{% for v in values %}{% render_rating_value v %}{% endfor %}')
+    report('rendered tag', us=round(measure(lambda: t.render(Context({'values': values})), 1000)
+                                    * 1000 / len(values), 3))
+
+
+@benchmark
+def post_review():
+    """post_review throughput with and without memoized review app resolution."""
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    import reviews
+    from reviews.forms import ReviewForm
+    from reviews.views import post_review
+    from testapp.models import Article
+
+    article = Article.objects.create(headline='Benchmark', body='Body', pub_date='2020-01-01')
+    data = dict(ReviewForm(article).initial, rating='4', comment='Benchmark review')
+    factory = RequestFactory()
+
+    def post():
+        request = factory.post('/post/', data)
+        request.user = AnonymousUser()
+        request._dont_enforce_csrf_checks = True
+        post_review(request)
+
+    def post_uncached():
+        reviews.clear_review_app_cache()
+        post()
+
+    for title, func in (('cached', post), ('uncached', post_uncached)):
+        ms = measure(func, 300)
+        report(title, ms=round(ms, 3), requests_per_second=round(1000 / ms))
+
+
+@benchmark
+def async_post_review():
+    """Concurrent posting throughput of sync post_review run in a thread, as by ASGI handler, and apost_review."""
+    import asyncio
+    from asgiref.sync import async_to_sync, sync_to_async
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import AsyncRequestFactory
+    from reviews.forms import ReviewForm
+    from reviews.views import post_review
+    from reviews.views_async import apost_review
+    from testapp.models import Article
+
+    article = Article.objects.create(headline='Benchmark', body='Body', pub_date='2020-01-01')
+    data = dict(ReviewForm(article).initial, rating='4', comment='Benchmark review')
+    factory = AsyncRequestFactory()
+    concurrency = 20
+
+    def make_request():
+        request = factory.post('/post/', data)
+        request.user = AnonymousUser()
+        request._dont_enforce_csrf_checks = True
+        return request
+
+    async def post_sync():
+        await asyncio.gather(*(sync_to_async(post_review)(make_request()) for _ in range(concurrency)))
+
+    async def post_async():
+        await asyncio.gather(*(apost_review(make_request()) for _ in range(concurrency)))
+
+    for title, func in (('sync view', post_sync), ('async view', post_async)):
+        ms = measure(async_to_sync(func), 20) / concurrency
+        report(title, ms=round(ms, 3), requests_per_second=round(1000 / ms))
+
+
+@benchmark
+def render_tags():
+    """Rendering 50 render_rating widgets in a large context, flattened context copies versus context.push()."""
+    import contextlib
+    import tracemalloc
+    from unittest import mock
+    from django.template import Context, Template
+    from django.template.loader import render_to_string
+    from reviews.templatetags.reviews import BaseReviewNode
+    from testapp.models import Product
+
+    create_reviews(objects=50, per_object=5)
+    products = list(Product.objects.all()[:50])
+    parent = {'var%d' % i: 'value %d' % i for i in range(500)}
+    t = Template('{% load reviews %}{% get_ratings_for products as ratings %}'
+                 '{% for p in products %}{% render_rating for p %}{% endfor %}')
+
+    def render_flattened(self, context, name, ctype, **values):
+        context_dict = context.flatten()
+        context_dict.update(values)
+        return render_to_string([
+            "reviews/%s/%s/%s.html" % (ctype.app_label, ctype.model, name),
+            "reviews/%s/%s.html" % (ctype.app_label, name),
+            "reviews/%s.html" % name,
+        ], context_dict)
+
+    def run():
+        t.render(Context(dict(parent, products=products)))
+
+    for title, patch in (('flatten', mock.patch.object(BaseReviewNode, 'render_template', render_flattened)),
+                         ('push', contextlib.nullcontext())):
+        with patch:
+            ms = measure(run, 20)
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        report(title, ms=round(ms, 3), peak_kb=round(peak / 1024, 1))
+
+
+@benchmark
+def template_selection():
+    """Review template lookup for a content type by loaders without cached loader and by template cache."""
+    from django.template import Engine
+    from reviews import template_cache
+
+    engine = Engine(loaders=['django.template.loaders.app_directories.Loader'],
+                    libraries=Engine.get_default().libraries)
+    search_list = template_cache.get_search_list('rating_average', 'testapp', 'product')
+    report('loaders', us=round(measure(lambda: engine.select_template(search_list), 1000) * 1000, 3))
+    report('template cache', us=round(measure(
+        lambda: template_cache.select_template('rating_average', 'testapp', 'product', engine=engine), 1000) * 1000, 3))
+
+
+@benchmark
+def lean_list():
+    """Fetching 1000 reviews of an object as model instances with users and as lean records."""
+    import tracemalloc
+    from reviews.models import Review
+
+    ctype = create_reviews(objects=1, per_object=1000)
+    qs = Review.objects.filter(content_type=ctype, site__pk=1).select_related('user')
+
+    for title, fetch in (('instances', lambda: list(qs.all())), ('records', lambda: list(qs.records()))):
+        ms = measure(fetch, 20)
+        tracemalloc.start()
+        reviews = fetch()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        report(title, ms_per_1000=round(ms * 1000 / len(reviews), 3), bytes_per_review=round(size / len(reviews)))
+
+
+@benchmark
+def profanities():
+    """Profanity check of a long comment with a large word list, plain scan versus compiled matcher."""
+    import random
+    import string
+    from reviews.profanity import ProfanityMatcher
+
+    rnd = random.Random(0)
+    words = sorted({''.join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(5, 10)))
+                    for _ in range(4000)})
+    comment = ' '.join(''.join(rnd.choice(string.ascii_letters) for _ in range(rnd.randint(2, 9)))
+                       for _ in range(500))[:3000]
+
+    report('substring scan', ms=round(measure(lambda: [w for w in words if w in comment.lower()], 20), 3))
+    for title, options in (('matcher', {}), ('whole words matcher', {'whole_words': True}),
+                           ('normalized matcher', {'normalize': True})):
+        start = time.perf_counter()
+        matcher = ProfanityMatcher(words, **options)
+        compile_ms = (time.perf_counter() - start) * 1000
+        report(title, ms=round(measure(lambda: matcher.find(comment), 20), 3), compile_ms=round(compile_ms, 1))
+
+
+def main(names=None):
+    django.setup()
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+    from django.test.runner import DiscoverRunner
+
+    settings.ROOT_URLCONF = 'testapp.urls_default'
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        for name in names or BENCHMARKS:
+            print('%s: %s' % (name, BENCHMARKS[name].__doc__))
+            BENCHMARKS[name]()
+            call_command('flush', interactive=False, verbosity=0)
+            ContentType.objects.clear_cache()
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,9 +1,12 @@
+from unittest import mock
+
 from django.core.exceptions import ImproperlyConfigured
 from django.test.utils import modify_settings, override_settings
 
 import reviews
 from reviews.models import Review
 from reviews.forms import ReviewForm
+from reviews.registry import get_capabilities
 
 from . import ReviewTestCase
 
@@ -33,6 +36,15 @@ class ReviewAppAPITests(ReviewTestCase):
         r1, _, _, _ = self.createSomeReviews()
         self.assertEqual(reviews.get_review_user_weight(r1.user, r1.content_object), 1)
 
+    def testGetCapabilities(self):
+        capabilities = get_capabilities()
+        self.assertIs(capabilities, get_capabilities())
+        self.assertEqual(capabilities.model, Review)
+        self.assertEqual(capabilities.form, ReviewForm)
+        self.assertTrue(capabilities.has_user)
+        self.assertTrue(capabilities.has_is_public)
+        self.assertTrue(capabilities.has_aggregates)
+
 
 @override_settings(
     REVIEW_APP='custom_reviews', ROOT_URLCONF='testapp.urls',
@@ -43,6 +55,15 @@ class CustomReviewTest(ReviewTestCase):
         import custom_reviews
         self.assertEqual(reviews.get_review_app(), custom_reviews)
 
+    def testReviewAppResolvedOnce(self):
+        import custom_reviews
+        reviews.get_review_model()
+        with mock.patch('reviews.import_module') as import_module:
+            self.assertEqual(reviews.get_review_app(), custom_reviews)
+            reviews.get_review_form()
+            reviews.get_review_user_weight(None, None)
+        import_module.assert_not_called()
+
     def testGetModel(self):
         from custom_reviews.models import CustomReview
         self.assertEqual(reviews.get_review_model(), CustomReview)
@@ -57,3 +78,31 @@ class CustomReviewTest(ReviewTestCase):
     def testGetUserWeight(self):
         r1, _, _, _ = self.createSomeReviews()
         self.assertEqual(reviews.get_review_user_weight(r1.user, r1.content_object), 2)
+
+    def testGetUserWeightWithStats(self):
+        r1, _, _, _ = self.createSomeReviews()
+
+        def get_review_user_weight(user, target, stats=None):
+            return stats.review_count
+
+        with mock.patch('custom_reviews.get_review_user_weight', get_review_user_weight):
+            reviews.clear_review_app_cache()
+            self.assertEqual(reviews.get_review_user_weight(r1.user, r1.content_object), 3)
+        reviews.clear_review_app_cache()
+
+    def testGetCapabilities(self):
+        from custom_reviews.models import CustomReview
+        capabilities = get_capabilities()
+        self.assertEqual(capabilities.model, CustomReview)
+        self.assertFalse(capabilities.has_user)
+        self.assertFalse(capabilities.has_is_public)
+        self.assertFalse(capabilities.has_aggregates)
+
+    def testCapabilitiesFollowResolvedModel(self):
+        self.assertFalse(get_capabilities().has_aggregates)
+        # Capabilities are reset together with the resolved review app
+        with mock.patch('custom_reviews.get_review_model', lambda: Review):
+            reviews.clear_review_app_cache()
+            self.assertEqual(get_capabilities().model, Review)
+        reviews.clear_review_app_cache()
+        self.assertFalse(get_capabilities().has_aggregates)
@@ -0,0 +1,222 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import BytesIO, StringIO, TextIOWrapper
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from reviews.models import Review, ReviewAggregate, ReviewerStats
+
+from . import ReviewTestCase, CT
+from testapp.models import Article, Product
+
+
+class ImportReviewsTests(ReviewTestCase):
+
+    def importFile(self, content, suffix, **options):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        out, err = StringIO(), StringIO()
+        call_command('import_reviews', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def testImportCSV(self):
+        self.createSomeReviews()
+        out, err = self.importFile(
+            "content_type,object_pk,rating,comment,username,submit_date,is_public\n"
+            "testapp.product,1,2,Too boxy,joe_uncought,2020-01-02T10:00:00,true\n"
+            "testapp.product,1,7,Wrong rating,,,true\n"
+            "testapp.unknown,1,3,Unknown model,,,true\n"
+            "testapp.article,1,3,,,,true\n"
+            "testapp.article,2,5,Great,,,false\n", '.csv', batch_size=1)
+        self.assertIn("Imported 2 reviews, skipped 3 rows", out)
+        self.assertIn("Row 3 skipped: rating should be between 1 and 5", err)
+        self.assertIn("Row 4 skipped: unknown content type 'testapp.unknown'", err)
+        self.assertIn("Row 5 skipped: comment is empty", err)
+        review = Review.objects.get(comment="Too boxy")
+        self.assertEqual(review.user.username, "joe_uncought")
+        self.assertEqual(review.submit_date.year, 2020)
+        self.assertTrue(review.is_public)
+        self.assertFalse(Review.objects.get(comment="Great").is_public)
+
+    def testImportJSONLines(self):
+        rows = [dict(content_type='testapp.product', object_pk=1, rating=r, comment="Review %d" % r, is_public=True)
+                for r in range(1, 6)]
+        rows.append({'object_pk': '1'})
+        content = '\n'.join(map(json.dumps, rows)) + '\nnot json\n'
+        with CaptureQueriesContext(connection) as queries:
+            out, err = self.importFile(content, '.jsonl', batch_size=3)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "reviews_review"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertIn("Imported 5 reviews, skipped 2 rows", out)
+        self.assertIn("Row 7 skipped: not a JSON object", err)
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 1, 1)
+        self.assertEqual(aggregate.review_count, 5)
+        self.assertEqual(aggregate.average_rating, 3)
+
+    def testImportInvalidValues(self):
+        self.createSomeReviews()
+        user_id = User.objects.get(username="joe_uncought").pk
+        out, err = self.importFile(
+            "content_type,object_pk,rating,comment,user_id,site_id,weight,ip_address,submit_date\n"
+            "testapp.product,1,2,Unknown user,999,,,,\n"
+            "testapp.product,1,2,Invalid user,abc,,,,\n"
+            "testapp.product,1,2,Unknown site,,99,,,\n"
+            "testapp.product,1,2,Negative weight,,,-1,,\n"
+            "testapp.product,1,2,Invalid IP,,,,300.1.1.1,\n"
+            "testapp.product,1,2,Invalid date,,,,,2020-13-01T10:00:00\n"
+            "testapp.product,1,2,Valid,%d,,2,::ffff:10.0.0.1,\n" % user_id, '.csv', batch_size=1)
+        self.assertIn("Imported 1 reviews, skipped 6 rows", out)
+        self.assertIn("Row 2 skipped: unknown user_id '999'", err)
+        self.assertIn("Row 3 skipped: invalid user_id 'abc'", err)
+        self.assertIn("Row 4 skipped: unknown site_id '99'", err)
+        self.assertIn("Row 5 skipped: weight should be between 0 and 32767", err)
+        self.assertIn("Row 6 skipped: invalid ip_address '300.1.1.1'", err)
+        self.assertIn("Row 7 skipped: invalid submit_date '2020-13-01T10:00:00'", err)
+        review = Review.objects.get(comment="Valid")
+        self.assertEqual((review.user_id, review.weight, review.ip_address), (user_id, 2, "10.0.0.1"))
+
+    def testImportFailureRefreshesCommittedBatches(self):
+        bulk_create = QuerySet.bulk_create
+        calls = []
+
+        def failing_bulk_create(queryset, objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) > 1:
+                raise IntegrityError("Failed batch")
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', failing_bulk_create), self.assertRaises(IntegrityError):
+            self.importFile(
+                "content_type,object_pk,rating,comment,is_public\n"
+                "testapp.product,1,4,Committed,1\n"
+                "testapp.product,1,2,Failed,1\n", '.csv', batch_size=1)
+        self.assertEqual(ReviewAggregate.objects.lookup(CT(Product), 1, 1).review_count, 1)
+
+    @override_settings(PROFANITIES_LIST=["rooster"])
+    def testImportProfanities(self):
+        out, err = self.importFile(
+            "content_type,object_pk,rating,comment\n"
+            "%d,1,2,What a rooster\n" % CT(Article).pk, '.csv')
+        self.assertIn("comment contains rooster", err)
+        self.assertFalse(Review.objects.exists())
+
+
+class ExportReviewsTests(ReviewTestCase):
+
+    def testExportCSV(self):
+        r2 = self.createSomeReviews()[1]
+        out = StringIO()
+        call_command('export_reviews', content_types=['testapp.product'], stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,content_type,object_pk,user_id,site_id,rating,weight,comment,'
+                                   'submit_date,ip_address,is_public')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith("2,testapp.product,1,%d,1,4,1,It's pretty boxy," % r2.user_id))
+
+    def testExportFilters(self):
+        self.createSomeReviews()
+        Review.objects.filter(pk=4).update(submit_date=datetime(2020, 1, 1))
+        out = StringIO()
+        call_command('export_reviews', since='2021-01-01', format='jsonl', stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [1, 2, 3])
+        out = StringIO()
+        call_command('export_reviews', until='2021-01-01', site=1, format='jsonl', stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [4])
+
+    def testExportRoundTrip(self):
+        self.createSomeReviews()
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'reviews.jsonl.gz')
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command('export_reviews', output=path, chunk_size=2, stdout=out)
+        self.assertIn("Exported 4 reviews", out.getvalue())
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 4)
+        Review.objects.all().delete()
+        call_command('import_reviews', path, stdout=StringIO())
+        self.assertEqual(sorted(Review.objects.values_list('comment', flat=True)),
+                         ["It's kinda not foxy", "It's not foxy but still suits", "It's pretty boxy", "Nice article."])
+
+    def testExportCompressedToStdout(self):
+        self.createSomeReviews()
+        out = TextIOWrapper(BytesIO(), encoding='utf-8')
+        call_command('export_reviews', gzip=True, format='jsonl', stdout=out)
+        lines = gzip.decompress(out.buffer.getvalue()).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [1, 2, 3, 4])
+        # Compressed data can not be written to text only stream
+        with self.assertRaises(CommandError):
+            call_command('export_reviews', gzip=True, stdout=StringIO())
+
+
+class RecalculateWeightsTests(ReviewTestCase):
+
+    def testRecalculateWeights(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.update(weight=3)
+        ReviewAggregate.objects.update(weight_sum=0)
+        out = StringIO()
+        call_command('recalculate_review_weights', chunk_size=2, verbosity=2, stdout=out)
+        self.assertIn("Recalculated weights of 4 reviews, updated 4.", out.getvalue())
+        self.assertEqual(set(Review.objects.values_list('weight', flat=True)), {1})
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 2, 1)
+        self.assertEqual(aggregate.weight_sum, aggregate.review_count)
+
+    def testRecalculateWeightsCheckpoint(self):
+        self.createSomeReviews()
+        Review.objects.update(weight=3)
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write('2')
+        out = StringIO()
+        call_command('recalculate_review_weights', checkpoint=path, stdout=out)
+        self.assertIn("Resuming after review 2", out.getvalue())
+        self.assertEqual(list(Review.objects.order_by('pk').values_list('weight', flat=True)), [3, 3, 1, 1])
+        self.assertFalse(os.path.exists(path))
+
+
+class RebuildStatisticsTests(ReviewTestCase):
+
+    def testRebuildAggregates(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        review = Review.objects.filter(is_public=True).last()
+        review.weight = 3
+        review.save()
+        fields = ('content_type', 'object_pk', 'site', 'review_count', 'rating_sum', 'weight_sum', 'histogram',
+                  'bayesian_average', 'wilson_score')
+        expected = list(ReviewAggregate.objects.order_by('object_pk').values_list(*fields))
+        ReviewAggregate.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_review_statistics', stdout=out)
+        self.assertIn("Rebuilt rating aggregates of %d objects" % len(expected), out.getvalue())
+        self.assertEqual(list(ReviewAggregate.objects.order_by('object_pk').values_list(*fields)), expected)
+
+    def testRebuildStats(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        fields = ('user', 'review_count', 'approved_count', 'rating_sum')
+        expected = list(ReviewerStats.objects.order_by('user').values_list(*fields))
+        ReviewerStats.objects.all().delete()
+        ReviewerStats.objects.create(user=User.objects.create_user('nobody'), review_count=1)
+        out = StringIO()
+        call_command('rebuild_review_statistics', stdout=out)
+        self.assertIn("statistics of %d reviewers" % len(expected), out.getvalue())
+        self.assertEqual(list(ReviewerStats.objects.order_by('user').values_list(*fields)), expected)
+
+    @override_settings(REVIEW_APP='custom_reviews')
+    def testRebuildCustomModelWithoutStatistics(self):
+        with self.assertRaisesMessage(CommandError, "custom_reviews.CustomReview"):
+            call_command('rebuild_review_statistics', stdout=StringIO())
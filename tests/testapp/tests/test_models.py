@@ -1,6 +1,17 @@
-from reviews.models import Review
+import uuid
+from unittest import mock
 
-from . import ReviewTestCase
+from django.conf import settings
+from django.db import DatabaseError, connection, models
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+
+from reviews import signals
+from reviews.models import Review, ReviewAggregate, ReviewerStats, RatingPrior
+from reviews.ratings import annotate_with_ratings, bayesian_average, summarize_reviews, wilson_score
+from reviews.registry import get_capabilities
+
+from . import ReviewTestCase, CT
 from testapp.models import Article, Product
 
 
@@ -15,3 +26,234 @@ class ReviewModelTests(ReviewTestCase):
         self.assertEqual(r2.rating, '4')
         self.assertEqual(r2.user, r3.user)
         self.assertEqual(r4.content_object, Product.objects.get(pk=2))
+
+    def testCursorPrimaryKeyType(self):
+        review = self.createSomeReviews()[0]
+        self.assertEqual(Review.objects.parse_cursor(Review.objects.get_cursor(review)), (review.submit_date, review.pk))
+        # Primary key is converted by the field of custom review model
+        pk = uuid.uuid4()
+        review.pk = pk
+        cursor = Review.objects.get_cursor(review)
+        review.pk = 'not-uuid'
+        malformed = Review.objects.get_cursor(review)
+        with mock.patch.object(Review._meta, 'pk', models.UUIDField(primary_key=True)):
+            self.assertEqual(Review.objects.parse_cursor(cursor), (review.submit_date, pk))
+            self.assertRaises(ValueError, Review.objects.parse_cursor, malformed)
+
+
+class ReviewAggregateTests(ReviewTestCase):
+    def testAggregateMaintainedOnSave(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        self.assertEqual(ReviewAggregate.objects.count(), 0)
+        self.moderateSomeReviews()
+        r3.is_public = True
+        r3.save()
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 2, r3.site_id)
+        self.assertEqual(aggregate.review_count, 2)
+        self.assertEqual(aggregate.average_rating, 3.5)
+        self.assertEqual(aggregate.get_histogram(), [0, 0, 1, 1, 0])
+
+    def testAggregateWeighted(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.filter(pk__in=(r3.pk, r4.pk)).update(is_public=True)
+        r3 = Review.objects.get(pk=r3.pk)
+        r3.weight = 3
+        r3.save()
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 2, r3.site_id)
+        self.assertEqual(aggregate.rating_sum, 13)
+        self.assertEqual(aggregate.weight_sum, 4)
+        self.assertEqual(aggregate.average_rating, 3.25)
+
+    def testAggregateMaintainedOnDelete(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.get(pk=4).delete()
+        self.assertIsNone(ReviewAggregate.objects.lookup(CT(Product), 2, settings.SITE_ID))
+        Review.objects.filter(pk=1).delete()
+        self.assertEqual(ReviewAggregate.objects.count(), 0)
+
+    def testAggregateMaintainedOnMove(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        review = Review.objects.get(pk=4)
+        review.object_pk = "1"
+        review.save()
+        self.assertIsNone(ReviewAggregate.objects.lookup(CT(Product), 2, settings.SITE_ID))
+        self.assertEqual(ReviewAggregate.objects.lookup(CT(Product), 1, settings.SITE_ID).review_count, 1)
+
+
+class RatingScoreTests(ReviewTestCase):
+    def createRatings(self, product, ratings):
+        for rating in ratings:
+            Review.objects.create(content_type=CT(Product), object_pk=str(product), site_id=settings.SITE_ID,
+                                  rating=rating, comment="Review", is_public=True)
+
+    def testScoreFunctions(self):
+        self.assertEqual(bayesian_average(10, 2, 3, 2), 4)
+        self.assertIsNone(bayesian_average(0, 0, 3, 2))
+        self.assertIsNone(wilson_score(None, 0))
+        self.assertAlmostEqual(wilson_score(5, 1), 0.2065, places=4)
+        self.assertGreater(wilson_score(4.8, 100), wilson_score(5, 1))
+
+    def testScoresMaintainedOnSave(self):
+        self.createRatings(1, [5, 4])
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 1, settings.SITE_ID)
+        # Default prior is the middle of rating scale with weight 1
+        self.assertEqual(aggregate.bayesian_average, 4)
+        self.assertAlmostEqual(aggregate.wilson_score, wilson_score(4.5, 2))
+        self.assertEqual(aggregate.get_summary().bayesian_average, 4)
+
+    def testRefreshPriors(self):
+        self.createRatings(1, [5])
+        self.createRatings(2, [5, 5, 4, 5, 5, 5, 5, 4, 5, 5])
+        priors = RatingPrior.objects.refresh()
+        mean, weight = priors[CT(Product).pk]
+        self.assertAlmostEqual(mean, 53 / 11)
+        self.assertEqual(weight, 5.5)
+        self.assertEqual(RatingPrior.objects.get_priors([CT(Product).pk]), priors)
+        # Aggregates are rescored with SQL expressions equivalent to Python functions
+        for aggregate in ReviewAggregate.objects.all():
+            self.assertAlmostEqual(aggregate.bayesian_average,
+                                   bayesian_average(aggregate.rating_sum, aggregate.weight_sum, mean, weight))
+            self.assertAlmostEqual(aggregate.wilson_score,
+                                   wilson_score(aggregate.average_rating, aggregate.review_count))
+
+    def testSummaryUsesPriorOfContentType(self):
+        self.createRatings(1, [5])
+        self.createRatings(2, [5, 5, 4, 5, 5, 5, 5, 4, 5, 5])
+        RatingPrior.objects.refresh()
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 1, settings.SITE_ID)
+        reviews = Review.objects.filter(content_type=CT(Product), object_pk='1')
+        self.assertNotEqual(aggregate.bayesian_average, 4)
+        self.assertAlmostEqual(reviews.rating_summary().bayesian_average, aggregate.bayesian_average)
+        self.assertAlmostEqual(summarize_reviews(list(reviews)).bayesian_average, aggregate.bayesian_average)
+        # Reviews of several content types use default prior
+        Review.objects.create(content_type=CT(Article), object_pk='1', site_id=settings.SITE_ID,
+                              rating=5, comment="Review", is_public=True)
+        self.assertEqual(Review.objects.filter(object_pk='1').rating_summary().bayesian_average, 13 / 3)
+
+    def testTopRated(self):
+        self.createRatings(1, [5])
+        self.createRatings(2, [5, 5, 4, 5, 5, 5, 5, 4, 5, 5])
+        self.createRatings(3, [3, 4])
+        for score in ('bayesian_average', 'wilson_score'):
+            top = ReviewAggregate.objects.top_rated(Product, settings.SITE_ID, score)
+            self.assertEqual([a.object_pk for a in top], ['2', '1', '3'])
+
+
+class AnnotateWithRatingsTests(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        for review in self.createSomeReviews():
+            review.is_public = True
+            review.save()
+        Product.objects.create(title="Unrated", price=1)
+
+    def testAnnotateFromAggregates(self):
+        with self.assertNumQueries(1):
+            products = list(annotate_with_ratings(Product.objects.all()).order_by('-average_rating', 'pk'))
+        self.assertEqual([(p.pk, p.review_count, p.average_rating) for p in products],
+                         [(1, 1, 4.0), (2, 2, 3.5), (3, 0, None)])
+        self.assertEqual(products[0].bayesian_average, 3.5)
+        qs = annotate_with_ratings(Product.objects.all()).filter(average_rating__gte=4)
+        self.assertEqual(list(qs.values_list('pk', flat=True)), [1])
+
+    def testAnnotateFromReviews(self):
+        Review.objects.filter(pk=4).update(weight=3)
+        capabilities = get_capabilities()
+        with mock.patch.object(capabilities, 'has_aggregates', False):
+            products = list(annotate_with_ratings(Product.objects.all()).order_by('pk'))
+        self.assertEqual([(p.review_count, p.average_rating) for p in products], [(1, 4.0), (2, 3.75), (0, None)])
+
+
+class ReviewerStatsTests(ReviewTestCase):
+    def getStats(self, user):
+        stats = ReviewerStats.objects.for_user(user)
+        return stats.review_count, stats.approved_count, stats.rating_sum
+
+    def testStatsMaintainedOnSave(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        self.assertEqual(self.getStats(r1.user), (3, 0, 12))
+        self.assertEqual(ReviewerStats.objects.for_user(r1.user).average_rating, 4)
+        r3 = Review.objects.get(pk=r3.pk)
+        r3.is_public = True
+        r3.rating = 5
+        with CaptureQueriesContext(connection) as queries:
+            r3.save()
+        # Statistics are updated incrementally with single UPDATE
+        self.assertEqual(len([q for q in queries if 'reviews_reviewerstats' in q['sql']]), 1)
+        self.assertEqual(self.getStats(r1.user), (3, 1, 14))
+        # Moved to another user
+        r3.user = r4.user
+        r3.save()
+        self.assertEqual(self.getStats(r1.user), (2, 0, 9))
+        self.assertEqual(self.getStats(r4.user), (2, 1, 9))
+
+    def testStatsMaintainedOnDelete(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.get(pk=r2.pk).delete()
+        self.assertEqual(self.getStats(r1.user), (2, 1, 8))
+        Review.objects.filter(user=r1.user).delete()
+        self.assertEqual(self.getStats(r1.user), (0, 0, 0))
+
+    def testStatsMaintainedOnModeration(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.filter(content_type=CT(Product)).moderate('approve')
+        self.assertEqual(self.getStats(r1.user), (3, 2, 12))
+        self.assertEqual(self.getStats(r4.user), (1, 1, 4))
+        Review.objects.all().moderate('reject')
+        self.assertEqual(self.getStats(r1.user), (3, 0, 12))
+        Review.objects.all().moderate('delete')
+        self.assertEqual(self.getStats(r1.user), (0, 0, 0))
+
+    def testModerationFailureFlushesCommittedBatches(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.update(is_public=False)
+        update = QuerySet.update
+
+        def fail_second_batch(qs, **kwargs):
+            if qs.model is Review and 'is_public' in kwargs:
+                batches.append(kwargs)
+                if len(batches) == 2:
+                    raise DatabaseError("Batch failed")
+            return update(qs, **kwargs)
+
+        batches = []
+        received = []
+        signals.reviews_moderated.connect(lambda **kwargs: received.append(kwargs), weak=False,
+                                          dispatch_uid='test_moderated')
+        self.addCleanup(signals.reviews_moderated.disconnect, dispatch_uid='test_moderated')
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=fail_second_batch):
+            with self.assertRaises(DatabaseError):
+                Review.objects.filter(pk__in=[r2.pk, r3.pk]).order_by('pk').moderate('approve', batch_size=1)
+        # First batch is committed and accounted
+        self.assertEqual(list(Review.objects.filter(is_public=True).values_list('pk', flat=True)), [r2.pk])
+        self.assertEqual(self.getStats(r1.user), (3, 1, 12))
+        self.assertEqual(ReviewAggregate.objects.lookup(CT(Product), 1, settings.SITE_ID).review_count, 1)
+        self.assertEqual(received, [])
+
+    def testModerationSkipsConcurrentlyModerated(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.update(is_public=False)
+        select_for_update = QuerySet.select_for_update
+
+        def approve_concurrently(qs, *args, **kwargs):
+            if qs.model is Review and not approved:
+                # Review is approved by another request after the batch was selected
+                approved.append(r2.pk)
+                review = Review.objects.get(pk=r2.pk)
+                review.is_public = True
+                review.save()
+            return select_for_update(qs, *args, **kwargs)
+
+        approved = []
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=approve_concurrently):
+            pks = Review.objects.filter(pk__in=[r2.pk, r3.pk]).moderate('approve')
+        self.assertEqual(pks, [r3.pk])
+        self.assertEqual(self.getStats(r1.user), (3, 2, 12))
+
+    def testAnonymousStats(self):
+        self.assertEqual(self.getStats(None), (0, 0, 0))
+        self.assertIsNone(ReviewerStats.objects.for_user(None).average_rating)
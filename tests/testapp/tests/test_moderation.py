@@ -0,0 +1,111 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from reviews import moderation
+from reviews.models import Review, ModerationTask
+
+from . import ReviewTestCase
+
+
+class ModerationQueueTests(ReviewTestCase):
+
+    def createTasks(self):
+        reviews = self.createSomeReviews()
+        Review.objects.update(is_public=False)
+        for review in reviews:
+            ModerationTask.objects.enqueue(review)
+        return reviews
+
+    def testEnqueue(self):
+        r1 = self.createSomeReviews()[0]
+        task = ModerationTask.objects.enqueue(r1)
+        self.assertEqual(task.status, ModerationTask.PENDING)
+        self.assertEqual(task.review, r1)
+
+    def testClaim(self):
+        self.createTasks()
+        tasks = ModerationTask.objects.claim('worker-1', 3)
+        self.assertEqual(len(tasks), 3)
+        self.assertTrue(all(t.status == ModerationTask.PROCESSING and t.worker == 'worker-1' for t in tasks))
+        # Claimed tasks are not given to other workers
+        tasks = ModerationTask.objects.claim('worker-2', 3)
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(ModerationTask.objects.claim('worker-3', 3), [])
+
+    @override_settings(PROFANITIES_LIST=['boxy'])
+    def testProcessPending(self):
+        self.createTasks()
+        self.assertEqual(moderation.process_pending(batch_size=10), 4)
+        flagged = ModerationTask.objects.get(status=ModerationTask.FLAGGED)
+        self.assertEqual(flagged.reason, "Profanities: boxy")
+        self.assertFalse(flagged.review.is_public)
+        self.assertEqual(ModerationTask.objects.filter(status=ModerationTask.APPROVED).count(), 3)
+        self.assertEqual(Review.objects.filter(is_public=True).count(), 3)
+
+    def testRetryFailedCheck(self):
+        self.createTasks()
+        with mock.patch.object(moderation, 'get_checks', return_value=[mock.Mock(side_effect=RuntimeError)]):
+            moderation.process_pending(batch_size=10)
+            self.assertEqual(ModerationTask.objects.filter(status=ModerationTask.PENDING, attempts=1).count(), 4)
+            # Failed tasks are retried after a delay
+            self.assertEqual(moderation.process_pending(batch_size=10), 0)
+            ModerationTask.objects.update(retry_at=timezone.now() - timedelta(seconds=1))
+            with mock.patch.object(moderation, 'REVIEW_MODERATION_MAX_ATTEMPTS', 2):
+                self.assertEqual(moderation.process_pending(batch_size=10), 4)
+        self.assertEqual(ModerationTask.objects.filter(status=ModerationTask.FAILED, attempts=2).count(), 4)
+
+    def testRetryDelayBackoff(self):
+        self.createTasks()
+        task = ModerationTask.objects.claim('worker-1', 1)[0]
+        ModerationTask.objects.filter(pk=task.pk).update(attempts=2)
+        task.refresh_from_db()
+        with mock.patch.object(moderation, 'get_checks', return_value=[mock.Mock(side_effect=RuntimeError)]):
+            start = timezone.now()
+            moderation.moderate(task)
+        task.refresh_from_db()
+        self.assertEqual(task.status, ModerationTask.PENDING)
+        self.assertGreaterEqual(task.retry_at, start + timedelta(seconds=moderation.REVIEW_MODERATION_RETRY_DELAY * 2))
+
+    def testReclaimAbandonedTasks(self):
+        self.createTasks()
+        tasks = ModerationTask.objects.claim('worker-1', 2, timeout=60)
+        self.assertEqual(len(ModerationTask.objects.claim('worker-2', 10, timeout=60)), 2)
+        # Worker 1 crashed
+        ModerationTask.objects.filter(pk__in=[t.pk for t in tasks]).update(
+            started=timezone.now() - timedelta(seconds=120))
+        reclaimed = ModerationTask.objects.claim('worker-3', 10, timeout=60)
+        self.assertEqual(sorted(t.pk for t in reclaimed), sorted(t.pk for t in tasks))
+        self.assertTrue(all(t.attempts == 2 for t in reclaimed))
+
+        # Tasks which keep crashing workers are given up
+        ModerationTask.objects.filter(pk__in=[t.pk for t in tasks]).update(
+            started=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(ModerationTask.objects.claim('worker-4', 10, timeout=60, max_attempts=2), [])
+        self.assertEqual(ModerationTask.objects.filter(status=ModerationTask.FAILED).count(), 2)
+
+    def testStats(self):
+        self.createTasks()
+        stats = ModerationTask.objects.stats()
+        self.assertEqual(stats['pending'], 4)
+        self.assertEqual(stats['approved'], 0)
+        self.assertGreaterEqual(stats['lag'], 0)
+        moderation.process_pending(batch_size=10)
+        stats = ModerationTask.objects.stats()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['approved'], 4)
+        self.assertEqual(stats['lag'], 0)
+
+    def testCommand(self):
+        self.createTasks()
+        out = StringIO()
+        # Worker threads would not see data of the test transaction
+        with mock.patch.object(moderation, 'ThreadPoolExecutor', return_value=mock.MagicMock(map=map)) as executor:
+            executor.return_value.__enter__.return_value = executor.return_value
+            call_command('moderate_reviews', once=True, verbosity=2, stdout=out)
+        self.assertIn("Moderated 4 reviews.", out.getvalue())
+        self.assertIn("pending: 0", out.getvalue())
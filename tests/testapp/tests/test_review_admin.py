@@ -1,3 +1,7 @@
+import gzip
+import json
+from unittest import mock
+
 from django.conf import settings
 from django.contrib.admin.sites import AdminSite
 from django.contrib.auth.models import User
@@ -5,11 +9,13 @@ from django.test import RequestFactory
 from django.test.utils import override_settings
 
 
+from reviews import signals
 from reviews.admin import ReviewAdmin
-from reviews.models import Review
+from reviews.models import Review, ReviewAggregate
 from reviews.widgets import ObjectPkWidget
 
-from . import ReviewTestCase
+from testapp.models import Product
+from . import ReviewTestCase, CT
 
 
 class MockSuperUser:
@@ -40,3 +46,57 @@ class ReviewAdminTests(ReviewTestCase):
         widget = ObjectPkWidget(Review.objects.get(pk=1))
         html = widget.render('object_pk', 1, attrs={})
         self.assertHTMLEqual(html, '<input type="text" name="object_pk" value="1">&nbsp;&nbsp;<strong><a href="/admin/testapp/article/1/change/">Man Bites Dog</a></strong>')
+
+    def testApproveReviews(self):
+        self.createSomeReviews()
+        received = []
+
+        def receive(sender, **kwargs):
+            received.append((kwargs['action'], sorted(kwargs['reviews'])))
+        signals.reviews_moderated.connect(receive)
+        try:
+            with mock.patch.object(self.admin, 'message_user') as message_user:
+                self.admin.approve_reviews(self.request, Review.objects.filter(content_type=CT(Product)))
+        finally:
+            signals.reviews_moderated.disconnect(receive)
+        message_user.assert_called_once_with(self.request, '3 reviews were successfully approved.')
+        self.assertEqual(received, [('approve', [2, 3, 4])])
+        self.assertEqual(Review.objects.filter(is_public=True).count(), 3)
+        aggregate = ReviewAggregate.objects.lookup(CT(Product), 2, settings.SITE_ID)
+        self.assertEqual((aggregate.review_count, aggregate.average_rating), (2, 3.5))
+
+    def testRejectReviews(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        with mock.patch.object(self.admin, 'message_user') as message_user:
+            self.admin.reject_reviews(self.request, Review.objects.all())
+        message_user.assert_called_once_with(self.request, '2 reviews were successfully rejected.')
+        self.assertFalse(Review.objects.filter(is_public=True).exists())
+        self.assertEqual(ReviewAggregate.objects.count(), 0)
+
+    def testDeleteQueryset(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        with mock.patch('reviews.models.ReviewAggregate.objects.refresh') as refresh:
+            self.admin.delete_queryset(self.request, Review.objects.filter(pk__in=(1, 3, 4)))
+        refresh.assert_called_once()
+        self.assertEqual(list(Review.objects.values_list('pk', flat=True)), [2])
+
+    def testModerateUnknownAction(self):
+        self.assertRaises(ValueError, Review.objects.all().moderate, 'flag')
+
+    def testExportReviews(self):
+        self.createSomeReviews()
+        response = self.admin.export_reviews_jsonl(self.request, Review.objects.filter(content_type=CT(Product)))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="reviews.jsonl.gz"')
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [2, 3, 4])
+        self.assertEqual(rows[0]['content_type'], 'testapp.product')
+        self.assertEqual(rows[0]['comment'], "It's pretty boxy")
+
+    def testExportRequiresModeratePermission(self):
+        self.assertIn('export_reviews_csv', self.admin.get_actions(self.request))
+        self.request.user = User.objects.create_user("editor")
+        actions = self.admin.get_actions(self.request)
+        self.assertNotIn('export_reviews_csv', actions)
+        self.assertNotIn('export_reviews_jsonl', actions)
@@ -2,9 +2,12 @@ import time
 
 from django.conf import settings
 from django.contrib.sites.models import Site
+from django.test import TestCase
+from django.test.utils import override_settings
 
 from reviews.forms import ReviewForm
 from reviews.models import Review
+from reviews.profanity import ProfanityMatcher, get_matcher
 
 from . import ReviewTestCase
 from testapp.models import Article
@@ -98,3 +101,49 @@ class ReviewFormTests(ReviewTestCase):
 
         # Restore settings
         settings.PROFANITIES_LIST, settings.REVIEW_ALLOW_PROFANITIES = saved
+
+    @override_settings(PROFANITIES_LIST=["rooster", "roost"], REVIEW_ALLOW_PROFANITIES=False)
+    def testProfanitiesErrorListsAllWords(self):
+        a = Article.objects.get(pk=1)
+        f = ReviewForm(a, data=dict(self.getValidData(a), comment="What a Rooster!", rating="4"))
+        self.assertFalse(f.is_valid())
+        self.assertIn('"r-----r" and "r---t"', f.errors['comment'][0])
+
+    def testProfanityMatcherRebuild(self):
+        with override_settings(PROFANITIES_LIST=["rooster"]):
+            matcher = get_matcher()
+            self.assertIs(get_matcher(), matcher)
+            with override_settings(REVIEW_PROFANITIES_WHOLE_WORDS=True):
+                self.assertIsNot(get_matcher(), matcher)
+                self.assertTrue(get_matcher().whole_words)
+
+
+class ProfanityMatcherTests(TestCase):
+
+    def testSubstrings(self):
+        matcher = ProfanityMatcher(["rooster", "roost", "hen", "Hens"])
+        self.assertEqual(matcher.find("Nice article"), [])
+        self.assertEqual(matcher.find("ROOSTERS and chickens"), ["rooster", "roost"])
+        self.assertEqual(matcher.find("Then they left"), ["hen"])
+        self.assertEqual(ProfanityMatcher([]).find("anything"), [])
+
+    def testWholeWords(self):
+        matcher = ProfanityMatcher(["rooster", "roost", "hen"], whole_words=True)
+        self.assertEqual(matcher.find("Then the roosters left"), [])
+        self.assertEqual(matcher.find("A rooster and a hen."), ["rooster", "hen"])
+        self.assertEqual(ProfanityMatcher(["big hen", "hen"], whole_words=True).find("a big hen"),
+                         ["big hen", "hen"])
+        # All words starting at the same position are reported
+        self.assertEqual(ProfanityMatcher(["big hen", "big", "bi"], whole_words=True).find("a big hen"),
+                         ["big hen", "big"])
+        self.assertEqual(ProfanityMatcher(["big hen", "big"], whole_words=True).find("bigger hens"), [])
+
+    def testOverlappingSubstrings(self):
+        matcher = ProfanityMatcher(["hens", "roosters", "he", "ens", "rooster"])
+        self.assertEqual(matcher.find("Roosters, hens"), ["hens", "roosters", "he", "ens", "rooster"])
+        self.assertEqual(matcher.find("the roost"), ["he"])
+
+    def testNormalize(self):
+        self.assertEqual(ProfanityMatcher(["rooster"]).find("What a Róoster"), [])
+        self.assertEqual(ProfanityMatcher(["rooster"], normalize=True).find("What a Ｒóoster"), ["rooster"])
+        self.assertEqual(ProfanityMatcher(["straße"], normalize=True).find("STRASSE"), ["straße"])
@@ -1,12 +1,25 @@
+from unittest import skipUnless
+
+import django
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
+from django.template import Context, Template
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
 
 from reviews import signals
-from reviews.models import REVIEW_MAX_LENGTH, Review
+from reviews.models import REVIEW_MAX_LENGTH, Review, ReviewAggregate
+from reviews.views import post_review
 
-from . import ReviewTestCase
+from . import ReviewTestCase, CT
 from testapp.models import Article, Product
 
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:
+    # Django < 3.0
+    sync_to_async = None
+
 
 class ReviewViewTests(ReviewTestCase):
 
@@ -163,6 +176,20 @@ class ReviewViewTests(ReviewTestCase):
         u = User.objects.get(username='normaluser')
         self.assertEqual(r.user, u)
 
+    def testPostReviewClearsRequestCache(self):
+        a = Article.objects.get(pk=1)
+        data = self.getValidData(a)
+        request = RequestFactory().post('/post/', data)
+        request.user = AnonymousUser()
+        request._dont_enforce_csrf_checks = True
+        t = Template("{% load reviews %}{% get_review_count for testapp.article 1 as c %}{{ c }}")
+        self.assertEqual(t.render(Context({'request': request})), "0")
+        post_review(request)
+        Review.objects.update(is_public=True)
+        # Count is looked up again instead of cached one
+        with self.assertNumQueries(1):
+            self.assertEqual(t.render(Context({'request': request})), "1")
+
     '''
     def testPreventDuplicateReviews(self):
         """Prevent posting the reviews twice by one user"""
@@ -292,3 +319,117 @@ class ReviewViewTests(ReviewTestCase):
             '/somewhere/else/?r=%s#baz' % Review.objects.latest('id').pk,
             fetch_redirect_response=False,
         )
+
+    def testReviewListJSON(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        url = "/list/%s/2/" % CT(Product).pk
+        response = self.client.get(url, {"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["reviews"]], [r4.pk])
+        self.assertEqual(data["reviews"][0]["user"], "joe_uncought")
+        response = self.client.get(url, {"limit": 1, "after": data["next"]})
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["reviews"]], [r3.pk])
+        self.assertIsNone(data["next"])
+
+    def testReviewListJSONBadArguments(self):
+        url = "/list/%s/2/" % CT(Product).pk
+        self.assertEqual(self.client.get(url, {"limit": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"after": "garbage"}).status_code, 400)
+
+
+@skipUnless(django.VERSION >= (4, 2), "Async views need Django 4.2+")
+@override_settings(ROOT_URLCONF='testapp.urls_async')
+class AsyncReviewViewTests(ReviewTestCase):
+
+    async def testPostReviewHTTPMethods(self):
+        response = await self.async_client.get("/post/")
+        self.assertEqual(response.status_code, 405)
+
+    async def testPostReviewBadObjectPK(self):
+        a = await Article.objects.aget(pk=1)
+        data = await sync_to_async(self.getValidData)(a)
+        data["object_pk"] = "14"
+        response = await self.async_client.post("/post/", data)
+        self.assertEqual(response.status_code, 400)
+
+    async def testPostReviewInvalid(self):
+        a = await Article.objects.aget(pk=1)
+        data = await sync_to_async(self.getValidData)(a)
+        data["rating"] = "9"
+        response = await self.async_client.post("/post/", data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "reviews/post.html")
+
+    async def testPostReviewCSRF(self):
+        self.async_client.handler.enforce_csrf_checks = True
+        a = await Article.objects.aget(pk=1)
+        data = await sync_to_async(self.getValidData)(a)
+        response = await self.async_client.post("/post/", data)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(await Review.objects.acount(), 0)
+
+    async def testPostAsAuthenticatedUser(self):
+        a = await Article.objects.aget(pk=1)
+        data = await sync_to_async(self.getValidData)(a)
+        await sync_to_async(self.async_client.force_login)(await User.objects.aget(username='normaluser'))
+        response = await self.async_client.post("/post/", data)
+        review = await Review.objects.select_related('user').alatest('id')
+        self.assertRedirects(response, '/posted/?r=%s' % review.pk, fetch_redirect_response=False)
+        self.assertEqual(review.user.username, 'normaluser')
+        self.assertEqual(review.ip_address, "127.0.0.1")
+        self.assertEqual(review.comment, "This is my comment")
+
+        response = await self.async_client.get('/posted/?r=%s' % review.pk)
+        self.assertTemplateUsed(response, "reviews/posted.html")
+        self.assertEqual(response.context["review"], review)
+
+    async def testUpdateReviewOfAnotherUser(self):
+        a = await Article.objects.aget(pk=1)
+        data = await sync_to_async(self.getValidData)(a)
+        other = await User.objects.acreate(username='other')
+        review = await sync_to_async(Review.objects.create)(
+            content_type=await sync_to_async(CT)(Article), object_pk='1', user=other, rating=5,
+            comment='Original', site_id=settings.SITE_ID)
+        await sync_to_async(self.async_client.force_login)(await User.objects.aget(username='normaluser'))
+        response = await self.async_client.post("/post/", dict(data, id=review.pk, comment="Spoofed"))
+        self.assertEqual(response.status_code, 400)
+        await review.arefresh_from_db()
+        self.assertEqual(review.comment, 'Original')
+
+    async def testUpdateAnonymousReview(self):
+        a = await Article.objects.aget(pk=1)
+        data = await sync_to_async(self.getValidData)(a)
+        review = await sync_to_async(Review.objects.create)(
+            content_type=await sync_to_async(CT)(Article), object_pk='1', rating=5,
+            comment='Original', site_id=settings.SITE_ID)
+        response = await self.async_client.post("/post/", dict(data, id=review.pk, comment="Spoofed"))
+        self.assertEqual(response.status_code, 400)
+        await review.arefresh_from_db()
+        self.assertEqual(review.comment, 'Original')
+
+    async def testReviewList(self):
+        await sync_to_async(self.createSomeReviews)()
+        await Review.objects.aupdate(is_public=True)
+        response = await self.async_client.get('/list/%d/2/' % (await sync_to_async(CT)(Product)).pk,
+                                                {'limit': 1})
+        data = response.json()
+        self.assertEqual([r['id'] for r in data['reviews']], [4])
+        self.assertIsNotNone(data['next'])
+
+    async def testAsyncManagerHelpers(self):
+        await sync_to_async(self.createSomeReviews)()
+        await sync_to_async(self.moderateSomeReviews)()
+        ctype = await sync_to_async(CT)(Product)
+        aggregate = await ReviewAggregate.objects.alookup(ctype, 2, settings.SITE_ID)
+        self.assertEqual(aggregate.review_count, 1)
+        products = Product.objects.order_by('pk')
+        self.assertEqual(await ReviewAggregate.objects.aratings_for(products, settings.SITE_ID),
+                         {1: (0, None), 2: (1, 4.0)})
+        self.assertEqual(await Review.objects.aratings_for(products), {1: (0, None), 2: (1, 4.0)})
+        summary = await Review.objects.filter(content_type=ctype).arating_summary()
+        self.assertEqual((summary.count, summary.histogram), (3, [0, 0, 1, 2, 0]))
+        reviews = await Review.objects.filter(content_type=ctype).aseek(limit=2)
+        self.assertEqual([r.pk for r in reviews], [4, 3])
@@ -1,15 +1,30 @@
+from pathlib import Path
+from unittest import mock
+
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
-from django.template import Template, Context
+from django.http import HttpResponse
+from django.template import Engine, Template, TemplateSyntaxError, Context, loader
 from django.test.client import RequestFactory
 from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.autoreload import file_changed
 
+from reviews import template_cache
+from reviews.cache import get_stats, reset_stats
 from reviews.forms import ReviewForm
+from reviews.managers import ReviewRecord
+from reviews.middleware import ReviewRequestCacheMiddleware
 from reviews.models import Review
+from reviews.ratings import get_rating_context, rating_value_context, summarize_ratings
+from reviews.registry import get_capabilities
+from reviews.request_cache import clear_request_cache
 
 from testapp.models import Article, Product
-from . import ReviewTestCase
+from . import ReviewTestCase, CT
 
 
 class ReviewTemplateTagTests(ReviewTestCase):
@@ -62,6 +77,111 @@ class ReviewTemplateTagTests(ReviewTestCase):
         with self.assertNumQueries(1):
             self.testRenderReviewFormFromObject()
 
+    def testUserReviewSharedByTags(self):
+        self.createSomeReviews()
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(username="frank_nobody")
+        t = "{% load reviews %}{% get_review_by_user for testapp.article 1 as review %}" \
+            "{% get_review_form for testapp.article 1 as form %}{% render_review_form for testapp.article 1 %}"
+        with self.assertNumQueries(2):
+            ctx, out = self.render(t, request=request)
+        self.assertEqual(ctx["review"].comment, "Nice article.")
+        self.assertEqual(ctx["form"].initial["comment"], "Nice article.")
+        self.assertIn("Nice article.", out)
+
+        # Lookups are repeated once the cache of the request is cleared
+        clear_request_cache(request)
+        with self.assertNumQueries(1):
+            self.render("{% load reviews %}{% get_review_by_user for testapp.article 1 as review %}",
+                        request=request)
+
+    def testUserReviewAnonymous(self):
+        self.createSomeReviews()
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        article = Article.objects.get(pk=1)
+        with self.assertNumQueries(0):
+            ctx, out = self.render("{% load reviews %}{% get_review_by_user for a as review %}",
+                                   a=article, request=request)
+        self.assertIsNone(ctx["review"])
+
+    def testReviewTagsShareRequestCache(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.filter(pk=3).update(is_public=True)
+        p = Product.objects.get(pk=2)
+        t = "{% load reviews %}{% get_review_list for p as reviews %}{% for r in reviews %}{{ r.rating }};{% endfor %}" \
+            "{% get_review_count for p as count %}{{ count }};{% get_rating for p as rating %}{{ rating }}"
+        self.render(t, p=p)
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(1):
+            ctx, out = self.render(t, p=p, request=request)
+        self.assertEqual(out, "4;3;2;3.5")
+
+        # Count is cached even if the list is not fetched
+        request = RequestFactory().get('/')
+        t = "{% load reviews %}{% get_review_count for p as count %}{% get_review_count for p as count %}{{ count }}"
+        with self.assertNumQueries(1):
+            ctx, out = self.render(t, p=p, request=request)
+        self.assertEqual(out, "2")
+
+    def testRatingSummaryFromFetchedReviews(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.filter(pk=3).update(is_public=True)
+        p = Product.objects.get(pk=2)
+        expected = summarize_ratings(Review.objects.filter(content_type=CT(Product), object_pk='2', is_public=True))
+        t = "{% load reviews %}{% get_review_list for p as reviews %}{% for r in reviews %}{% endfor %}" \
+            "{% get_rating_summary for p as summary %}"
+        with mock.patch.object(get_capabilities(), 'has_aggregates', False):
+            ctx, out = self.render(t, p=p)
+            with self.assertNumQueries(1):
+                ctx, out = self.render(t, p=p, request=RequestFactory().get('/'))
+        self.assertEqual(ctx["summary"].count, expected.count)
+        self.assertEqual(ctx["summary"].average, expected.average)
+        self.assertEqual(ctx["summary"].histogram, expected.histogram)
+        self.assertEqual(ctx["summary"].bayesian_average, expected.bayesian_average)
+
+    def testRequestCacheMiddleware(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        t = Template("{% load reviews %}{% get_review_count for testapp.product 2 as c %}"
+                     "{% get_review_count for testapp.product 2 as c %}{{ c }}")
+        middleware = ReviewRequestCacheMiddleware(lambda request: HttpResponse(t.render(Context({'request': request}))))
+        with self.settings(DEBUG=True), self.assertLogs('reviews.middleware', 'DEBUG') as logs, \
+                self.assertNumQueries(1):
+            response = middleware(RequestFactory().get('/product/'))
+        self.assertEqual(response.content, b"1")
+        self.assertEqual(logs.output, ["DEBUG:reviews.middleware:Review tags saved 1 queries rendering /product/"])
+
+    def testTemplateSelectedOncePerContentType(self):
+        template_cache.clear()
+        t = "{% load reviews %}{% render_rating for testapp.product 2 %}{% render_rating for testapp.article 1 %}"
+        with mock.patch.object(Engine, 'select_template', autospec=True, side_effect=Engine.select_template) as select:
+            self.render(t)
+            self.render(t)
+        # Inclusion tag of rating value selects its template too
+        search_lists = [args[1] for args, kwargs in select.call_args_list if args[1] != ('reviews/rating_value.html',)]
+        self.assertEqual(search_lists, [
+            ["reviews/testapp/product/rating_average.html", "reviews/testapp/rating_average.html",
+             "reviews/rating_average.html"],
+            ["reviews/testapp/article/rating_average.html", "reviews/testapp/rating_average.html",
+             "reviews/rating_average.html"],
+        ])
+
+    def testTemplateCacheInvalidation(self):
+        template_cache.clear()
+        with mock.patch('django.template.loader.select_template', wraps=loader.select_template) as select:
+            template_cache.select_template('post', 'testapp', 'article')
+            template_cache.select_template('post', 'testapp', 'article')
+            self.assertEqual(select.call_count, 1)
+            file_changed.send(sender=None, file_path=Path('/templates/reviews/post.html'))
+            template_cache.select_template('post', 'testapp', 'article')
+            self.assertEqual(select.call_count, 2)
+            with override_settings(TEMPLATES=settings.TEMPLATES):
+                template_cache.select_template('post', 'testapp', 'article')
+            self.assertEqual(select.call_count, 3)
+
     def verifyGetReviewCount(self, tag=None):
         t = "{% load reviews %}" + (tag or "{% get_review_count for testapp.article a.id as rc %}") + "{{ rc }}"
         ctx, out = self.render(t, a=Article.objects.get(pk=1))
@@ -214,3 +334,180 @@ class ReviewTemplateTagTests(ReviewTestCase):
 
         with self.assertNumQueries(2):
             self.verifyGetReviewCount()
+
+    def testGetRating(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.filter(pk=3).update(is_public=True)
+        Review.objects.get(pk=3).save()
+        ctx, out = self.render("{% load reviews %}{% get_rating for p as rating %}{{ rating }}",
+                               p=Product.objects.get(pk=2))
+        self.assertEqual(out, "3.5")
+        ctx, out = self.render("{% load reviews %}{% get_rating for p as rating %}{{ rating }}",
+                               p=Product.objects.get(pk=1))
+        self.assertEqual(out, "None")
+
+    def testRenderRating(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        with self.assertNumQueries(1):
+            ctx, out = self.render("{% load reviews %}{% render_rating for testapp.product 2 %}")
+        self.assertIn('<meta itemprop="ratingValue" content="4.0" />', out)
+        self.assertIn('<meta itemprop="reviewCount" content="1" />', out)
+        self.assertIn('s40', out)
+
+    def testGetRatingsFor(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        products = Product.objects.order_by('pk')
+        t = "{% load reviews %}{% get_ratings_for products as ratings %}" \
+            "{% for p in products %}{% get_rating for p as rating %}{{ rating }};{% endfor %}"
+        with self.assertNumQueries(2):
+            ctx, out = self.render(t, products=products)
+        self.assertEqual(out, "None;4.0;")
+        self.assertEqual(ctx["ratings"], {1: (0, None), 2: (1, 4.0)})
+
+    def testRatingsForManager(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        Review.objects.filter(pk=3).update(is_public=True)
+        ratings = Review.objects.ratings_for(Product.objects.all(), settings.SITE_ID)
+        self.assertEqual(ratings, {1: (0, None), 2: (2, 3.5)})
+        self.assertEqual(Review.objects.ratings_for([]), {})
+
+    def testGetReviewListPaginated(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        t = "{% load reviews %}{% get_review_list for testapp.product 2 as rl limit 1 page p %}"
+        ctx, out = self.render(t, p=1)
+        self.assertEqual(list(ctx["rl"]), [r4])
+        ctx, out = self.render(t, p=2)
+        self.assertEqual(list(ctx["rl"]), [r3])
+        ctx, out = self.render(t, p=3)
+        self.assertEqual(list(ctx["rl"]), [])
+
+    def testRenderReviewListLimited(self):
+        self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        t = "{% load reviews %}{% render_review_list for testapp.product 2 limit 1 %}"
+        ctx, out = self.render(t)
+        self.assertEqual(out.count("<dt "), 1)
+
+    def testGetReviewListLean(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        t = "{% load reviews %}{% get_review_list for testapp.product 2 as rl limit 1 page p lean %}"
+        ctx, out = self.render(t, p=2)
+        records = list(ctx["rl"])
+        self.assertEqual(len(records), 1)
+        self.assertIsInstance(records[0], ReviewRecord)
+        self.assertEqual((records[0].id, records[0].rating, records[0].comment, records[0].submit_date),
+                         (r3.pk, int(r3.rating), r3.comment, r3.submit_date))
+        self.assertEqual(records[0].user, r3.user.username)
+
+        # Variable named lean is not an option
+        ctx, out = self.render("{% load reviews %}{% get_review_list for testapp.product 2 as lean %}")
+        self.assertEqual(list(ctx["lean"]), [r4, r3])
+
+    def testReviewRecordsByColumnNames(self):
+        r1, r2, r3, r4 = self.createSomeReviews()
+        columns = {'id': 'pk', 'rating': 'rating', 'weight': 'weight', 'comment': 'comment', 'user': 'user__email'}
+        # Review model without submit_date and user model with custom USERNAME_FIELD
+        with mock.patch('reviews.managers.get_record_columns', return_value=columns):
+            record = Review.objects.filter(pk=r1.pk).records().get()
+        self.assertEqual((record.id, record.rating, record.submit_date, record.user), (r1.pk, 5, None, r1.user.email))
+
+    def testRenderReviewListLean(self):
+        self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        ctx, out = self.render("{% load reviews %}{% render_review_list for testapp.product 2 %}")
+        with self.assertNumQueries(1):
+            ctx, lean = self.render("{% load reviews %}{% render_review_list for testapp.product 2 lean %}")
+        self.assertEqual(lean, out)
+        self.assertEqual(out.count("<dt "), 2)
+
+    def testInvalidReviewListOption(self):
+        self.assertRaises(TemplateSyntaxError, self.render,
+                          "{% load reviews %}{% render_review_list for a limit 1 limit 2 %}")
+        self.assertRaises(TemplateSyntaxError, self.render,
+                          "{% load reviews %}{% render_review_list for a lean lean %}")
+
+    @mock.patch('reviews.cache.REVIEW_CACHE', 'default')
+    def testRenderRatingCached(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        cache.clear()
+        t = "{% load reviews %}{% render_rating for testapp.product 2 %}"
+        ctx, out = self.render(t)
+        with self.assertNumQueries(0):
+            ctx, cached = self.render(t)
+        self.assertEqual(out, cached)
+        review = Review.objects.get(pk=3)
+        review.is_public = True
+        review.save()
+        ctx, out = self.render(t)
+        self.assertIn('<meta itemprop="ratingValue" content="3.5" />', out)
+
+    @mock.patch('reviews.cache.REVIEW_LIST_CACHE', 'default')
+    def testRenderReviewListCached(self):
+        self.createSomeReviews()
+        self.moderateSomeReviews()
+        cache.clear()
+        reset_stats()
+        t = "{% load reviews %}{% render_review_list for testapp.product 2 limit l %}"
+        ctx, out = self.render(t, l=10)
+        with self.assertNumQueries(0):
+            ctx, cached = self.render(t, l=10)
+        self.assertEqual(out, cached)
+        self.assertEqual(get_stats(), {'list': {'hits': 1, 'misses': 1}})
+        self.render(t, l=1)
+        self.assertEqual(get_stats(), {'list': {'hits': 1, 'misses': 2}})
+        # Lean lists and lists rendered in other time zone are cached separately
+        self.render("{% load reviews %}{% render_review_list for testapp.product 2 limit l lean %}", l=10)
+        self.assertEqual(get_stats(), {'list': {'hits': 1, 'misses': 3}})
+        with timezone.override('Europe/Berlin'):
+            self.render(t, l=10)
+        self.assertEqual(get_stats(), {'list': {'hits': 1, 'misses': 4}})
+        review = Review.objects.get(pk=3)
+        review.is_public = True
+        review.save()
+        ctx, out = self.render(t, l=10)
+        self.assertEqual(out.count("<dt "), 2)
+
+    def testRenderRatingValue(self):
+        ctx, out = self.render("{% load reviews %}{% render_rating_value r %}", r=4)
+        self.assertIn('class="gl-star-rating-stars s40 readonly" title="4.0 (Very Good)"', out)
+        ctx, out = self.render("{% load reviews %}{% render_rating_value r %}", r=3.26)
+        self.assertIn('class="gl-star-rating-stars s35 readonly" title="3.3 (Average)"', out)
+
+    def testPrecomputedRatingValues(self):
+        for key in range(51):
+            self.assertEqual(rating_value_context(key / 10), get_rating_context(key / 10))
+        self.assertEqual(rating_value_context(4.04), get_rating_context(4.0))
+
+    def testGetRatingSummary(self):
+        self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        Review.objects.get(pk=3).save()
+        t = "{% load reviews %}{% get_rating_summary for p as s %}" \
+            "{{ s.count }};{{ s.average }};{% for r, text, c in s.distribution %}{{ r }}={{ c }} {% endfor %}"
+        product = Product.objects.get(pk=2)
+        with self.assertNumQueries(1):
+            ctx, out = self.render(t, p=product)
+        self.assertEqual(out, "2;3.5;1=0 2=0 3=1 4=1 5=0 ")
+        ctx, out = self.render(t, p=Product.objects.get(pk=1))
+        self.assertEqual(out, "0;None;1=0 2=0 3=0 4=0 5=0 ")
+
+    def testRatingSummaryQuery(self):
+        self.createSomeReviews()
+        Review.objects.update(is_public=True)
+        with self.assertNumQueries(1):
+            summary = Review.objects.for_model(Product).rating_summary()
+        self.assertEqual((summary.count, summary.average, summary.histogram), (3, 11 / 3, [0, 0, 1, 2, 0]))
+        # Prior of the content type is looked up only when Bayesian average is used
+        with self.assertNumQueries(1):
+            self.assertEqual(summary.bayesian_average, 3.5)
+        with self.assertNumQueries(1):
+            self.assertEqual(summarize_ratings(Review.objects.for_model(Product), (3, 1)).bayesian_average, 3.5)
+        summary = Review.objects.none().rating_summary()
+        self.assertEqual((summary.count, summary.average), (0, None))